@@ -0,0 +1,72 @@
+import contextvars
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, Optional
+
+
+class ApiCallCounter:
+    """Per-service API call, retry, throttle and error counts for one task or request"""
+
+    FIELDS = ('calls', 'retries', 'throttles', 'errors')
+
+    def __init__(self, label: str = ''):
+        self.label = label
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()  # steps of one task record from several threads
+
+    def record(self, service: str, field: str, amount: int = 1):
+        with self._lock:
+            counts = self._counts.setdefault(service, dict.fromkeys(self.FIELDS, 0))
+            counts[field] += amount
+
+    def summary(self) -> Dict:
+        with self._lock:
+            by_service = {service: dict(counts) for service, counts in sorted(self._counts.items())}
+        totals = {field: sum(counts[field] for counts in by_service.values()) for field in self.FIELDS}
+        return dict(totals, by_service=by_service)
+
+    def log_line(self) -> str:
+        summary = self.summary()
+        services = ', '.join(f"{service} {counts['calls']}" for service, counts in summary['by_service'].items())
+        return (f"📊 API calls for {self.label}: {summary['calls']} total ({services or 'none'}), "
+                f"{summary['retries']} retried, {summary['throttles']} throttled, {summary['errors']} failed")
+
+
+# The counter of the task running in the current context (copied into StepGraph threads)
+_current_counter: contextvars.ContextVar[Optional[ApiCallCounter]] = contextvars.ContextVar(
+    'api_call_counter', default=None
+)
+
+
+def current_counter() -> Optional[ApiCallCounter]:
+    return _current_counter.get()
+
+
+def record(service: str, field: str, amount: int = 1):
+    counter = _current_counter.get()
+    if counter is not None:
+        counter.record(service, field, amount)
+
+
+@contextmanager
+def track_api_calls(label: str):
+    """Count every API call made in this context; prints a summary line on exit"""
+    counter = ApiCallCounter(label)
+    token = _current_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _current_counter.reset(token)
+        print(counter.log_line())
+
+
+def tracked_api_calls(label: str):
+    """View decorator: count the API calls a request makes (read them with current_counter())"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            with track_api_calls(label):
+                return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,14 +1,22 @@
-from flask import Flask, request, jsonify, render_template, send_from_directory, send_file, session
+from flask import Flask, request, jsonify, render_template, send_from_directory, send_file, session, Response, stream_with_context
 from flask_cors import CORS
-import threading
+import queue
 import uuid
 import os
 import re
 import io
-import boto3
 from bs4 import BeautifulSoup
 from config import Config
 from aws_automation import AWSAutomation
+from async_automation import get_setup_runner
+from certificate_packs import build_certificate_packs
+from aws_clients import get_s3_client
+from aws_inventory import get_inventory
+from task_scheduler import DomainTaskScheduler, TaskCancelled
+from task_store import FINISHED_STATUSES, DomainCheckpointStore, TaskStore
+from task_events import TaskEventBus, format_sse
+from metrics import render_metrics
+from api_accounting import current_counter, track_api_calls, tracked_api_calls
 from flask_login import LoginManager, login_required, UserMixin, login_user, logout_user, current_user
 from flask import redirect, url_for
 from datetime import timedelta
@@ -101,8 +109,46 @@ def w3bcopier():
         print(f"Error in w3bcopier route: {str(e)}")
         return f"Error loading W3bCopier: {str(e)}", 500
 
-# Store domain setup status
-domain_status = {}
+# Store domain setup status (SQLite, shared by all worker processes)
+task_store = TaskStore(Config.TASK_DB_PATH)
+
+# Per-domain step outputs, so failed setups can be resumed
+checkpoint_store = DomainCheckpointStore(Config.TASK_DB_PATH)
+
+# Runs domain setups with bounded per-account and global concurrency
+setup_scheduler = DomainTaskScheduler(
+    max_concurrency=Config.SETUP_MAX_CONCURRENCY,
+    max_per_account=Config.SETUP_MAX_CONCURRENCY_PER_ACCOUNT
+)
+
+# Pushes progress_callback events to /api/status/stream subscribers
+task_events = TaskEventBus()
+
+def cancel_local_task(task_id):
+    """Cancel a task scheduled in this worker process; returns its previous state (None if unknown here)"""
+    previous_state = setup_scheduler.cancel(task_id)
+    if previous_state == 'queued':
+        # Never started, so nothing else will finish its document
+        status = task_store.get(task_id) or {}
+        status['status'] = 'cancelled'
+        status['progress'] = 'Cancelled before start'
+        task_store.replace(task_id, status)
+        task_events.publish(task_id, {'type': 'done', 'document': status})
+    elif previous_state is not None:
+        task_store.update(task_id, lambda status: status.update(progress='Cancelling...'), flush=True)
+    return previous_state
+
+# Cancellations requested through another worker process
+task_store.on_cancel_requested = cancel_local_task
+
+# Local index of every account's certificates, zones, distributions and buckets
+inventory = get_inventory()
+
+@app.before_request
+def ensure_inventory_sync():
+    # Started lazily so every worker process (forked after import) runs its own sync thread
+    if inventory is not None:
+        inventory.start()
 
 # ===== W3BCOPIER SCRAPER CLASS =====
 
@@ -110,21 +156,84 @@ domain_status = {}
 
 # ===== DOMAIN SETUP FUNCTIONALITY =====
 
-def setup_domain_async(domain, task_id, account_key='auto-insurance'):
-    """Async function to setup domain"""
-    automation = AWSAutomation(account_key=account_key)
-    
+def setup_domain_async(domain, task_id, account_key='auto-insurance', cancel_event=None, resume=False,
+                       certificate_pack=None, validation_mode=None):
+    """
+    Async function to setup domain. With SETUP_ENGINE=asyncio the setup is handed
+    to the event loop engine and the future of its completion is returned.
+    """
+    started_at = time.time()
+
     def update_progress(message, step_key=None, step_status=None):
-        domain_status[task_id]['progress'] = message
-        if step_key and step_status:
-            if 'steps' not in domain_status[task_id]:
-                domain_status[task_id]['steps'] = {}
-            if step_key not in domain_status[task_id]['steps']:
-                domain_status[task_id]['steps'][step_key] = {}
-            domain_status[task_id]['steps'][step_key]['status'] = step_status
+        if cancel_event is not None and cancel_event.is_set():
+            raise TaskCancelled('Task cancelled')
+
+        now = time.time()
+        event = {
+            'step': step_key,
+            'status': step_status,
+            'message': message,
+            'timestamp': now,
+            'elapsed': round(now - started_at, 3)
+        }
+
+        def apply(status):
+            status['status'] = 'in_progress'
+            status['progress'] = message
+            if step_key and step_status:
+                if 'steps' not in status:
+                    status['steps'] = {}
+                if step_key not in status['steps']:
+                    status['steps'][step_key] = {'started_at': now}
+                step = status['steps'][step_key]
+                step['status'] = step_status
+                step['message'] = message
+                if step_status in ('completed', 'failed'):
+                    step['duration'] = round(now - step.get('started_at', now), 3)
+                    event['step_duration'] = step['duration']
+
+        task_store.update(task_id, apply)
+        task_events.publish(task_id, event)
     
-    result = automation.setup_domain(domain, progress_callback=update_progress)
-    domain_status[task_id] = result
+    def finish(result, api_calls):
+        result['api_calls'] = api_calls.summary()
+        if cancel_event is not None and cancel_event.is_set():
+            result['status'] = 'cancelled'
+            result['progress'] = 'Cancelled'
+        result['elapsed'] = round(time.time() - started_at, 3)
+        task_store.replace(task_id, result)
+        task_events.publish(task_id, {'type': 'done', 'document': result})
+
+    if Config.SETUP_ENGINE == 'asyncio':
+        runner = get_setup_runner()
+        async_automation = runner.automation(account_key)
+
+        async def run():
+            with track_api_calls(f'setup of {domain}') as api_calls:
+                result = await async_automation.setup_domain(
+                    domain,
+                    progress_callback=update_progress,
+                    checkpoints=checkpoint_store,
+                    resume=resume,
+                    certificate_pack=certificate_pack,
+                    validation_mode=validation_mode
+                )
+            # finish() writes SQLite: keep it off the event loop thread
+            await runner.run_blocking(finish, result, api_calls)
+
+        return runner.submit(run())
+
+    automation = AWSAutomation.for_account(account_key)
+    with track_api_calls(f'setup of {domain}') as api_calls:
+        result = automation.setup_domain(
+            domain,
+            progress_callback=update_progress,
+            checkpoints=checkpoint_store,
+            resume=resume,
+            certificate_pack=certificate_pack,
+            validation_mode=validation_mode
+        )
+    finish(result, api_calls)
 
 # ===== API ROUTES =====
 
@@ -133,6 +242,12 @@ def health_check():
     """Health check endpoint"""
     return jsonify({'status': 'healthy'})
 
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    payload, content_type = render_metrics()
+    return Response(payload, content_type=content_type)
+
 @app.route('/api/accounts', methods=['GET'])
 def get_accounts():
     """Get available AWS accounts"""
@@ -148,49 +263,45 @@ def get_accounts():
 @app.route('/api/check-existing/<domain>', methods=['GET'])
 def check_existing_resources(domain):
     """Check for existing AWS resources for a domain"""
-    automation = AWSAutomation()
+    account_key = request.args.get('account', 'auto-insurance')
+    if account_key not in Config.AWS_ACCOUNTS:
+        return jsonify({'error': f'Invalid account: {account_key}'}), 400
     
     try:
-        result = {
-            'domain': domain,
-            'resources': {}
-        }
-        
-        # Check CloudFront
-        cf_result = automation.check_existing_cloudfront_distribution(domain)
-        result['resources']['cloudfront'] = cf_result
-        
-        # Check Route 53 hosted zone
-        try:
-            response = automation.route53_client.list_hosted_zones_by_name(DNSName=domain)
-            zones = response.get('HostedZones', [])
-            for zone in zones:
-                if zone['Name'].rstrip('.') == domain:
-                    result['resources']['route53'] = {
-                        'exists': True,
-                        'zone_id': zone['Id'].split('/')[-1],
-                        'name': zone['Name']
-                    }
-                    break
-            else:
-                result['resources']['route53'] = {'exists': False}
-        except Exception:
-            result['resources']['route53'] = {'exists': False}
+        automation = AWSAutomation.for_account(account_key)
+        resources = automation.check_existing_resources([domain])[domain]
+        return jsonify({'domain': domain, 'resources': resources})
         
-        # Check S3 buckets
-        try:
-            automation.s3_client.head_bucket(Bucket=domain)
-            result['resources']['s3_main'] = {'exists': True}
-        except:
-            result['resources']['s3_main'] = {'exists': False}
-        
-        try:
-            automation.s3_client.head_bucket(Bucket=f'www.{domain}')
-            result['resources']['s3_www'] = {'exists': True}
-        except:
-            result['resources']['s3_www'] = {'exists': False}
-        
-        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/check-existing', methods=['POST'])
+def check_existing_resources_bulk():
+    """Check existing AWS resources for many domains on one account"""
+    data = request.json or {}
+    account_key = data.get('account', 'auto-insurance')
+    domains_input = data.get('domains', [])
+    
+    if account_key not in Config.AWS_ACCOUNTS:
+        return jsonify({'error': f'Invalid account: {account_key}'}), 400
+    
+    # Accept a list or a comma/newline separated string, like /api/setup-domain
+    if isinstance(domains_input, str):
+        domains_input = re.split(r'[,\s]+', domains_input)
+    domains = list(dict.fromkeys(d.strip() for d in domains_input if d and d.strip()))
+    
+    if not domains:
+        return jsonify({'error': 'No valid domains provided'}), 400
+    
+    try:
+        automation = AWSAutomation.for_account(account_key)
+        started_at = time.time()
+        resources = automation.check_existing_resources(domains)
+        return jsonify({
+            'account': Config.AWS_ACCOUNTS[account_key]['name'],
+            'results': [{'domain': domain, 'resources': resources[domain]} for domain in domains],
+            'duration': round(time.time() - started_at, 2)
+        })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -219,19 +330,8 @@ def get_w3bcopier_buckets(account_key):
         if account_key not in Config.AWS_ACCOUNTS:
             return jsonify({'error': f'Invalid account: {account_key}'}), 400
             
-        # Get account credentials
-        account_config = Config.AWS_ACCOUNTS[account_key]
-        access_key_id = account_config['access_key_id']
-        secret_access_key = account_config['secret_access_key']
-        region = account_config['region']
-        
-        # Create S3 client
-        s3_client = boto3.client(
-            's3',
-            region_name=region,
-            aws_access_key_id=access_key_id,
-            aws_secret_access_key=secret_access_key
-        )
+        # Shared S3 client for this account
+        s3_client = get_s3_client(account_key)
         
         # List buckets
         response = s3_client.list_buckets()
@@ -253,6 +353,9 @@ def setup_domain():
     data = request.json
     domains_input = data.get('domain', '').strip()
     account_key = data.get('account', 'auto-insurance')
+    resume = bool(data.get('resume', False))  # Skip steps completed by a previous attempt
+    pack_certificates = bool(data.get('pack_certificates', False))  # Share multi-SAN certificates across the batch
+    validation_mode = data.get('validation_mode') or Config.CERT_VALIDATION_MODE  # 'namecheap' or 'route53'
     
     if not domains_input:
         return jsonify({'error': 'Domain is required'}), 400
@@ -261,12 +364,18 @@ def setup_domain():
     if account_key not in Config.AWS_ACCOUNTS:
         return jsonify({'error': f'Invalid account: {account_key}'}), 400
     
+    if validation_mode not in ('namecheap', 'route53'):
+        return jsonify({'error': f'Invalid validation_mode: {validation_mode}'}), 400
+    
     # Parse multiple domains separated by comma
     domains = [d.strip() for d in domains_input.split(',') if d.strip()]
     
     if not domains:
         return jsonify({'error': 'No valid domains provided'}), 400
     
+    # Up to ACM_MAX_SANS names per certificate, validated once per pack
+    certificate_packs = build_certificate_packs(domains) if pack_certificates else {}
+    
     # Generate task IDs for each domain
     tasks = []
     
@@ -274,25 +383,31 @@ def setup_domain():
         task_id = str(uuid.uuid4())
         
         # Initialize status
-        domain_status[task_id] = {
+        task_store.create(task_id, {
             'domain': domain,
             'account': Config.AWS_ACCOUNTS[account_key]['name'],
-            'status': 'started',
-            'progress': 'Initializing...'
-        }
+            'status': 'queued',
+            'progress': 'Waiting for a free worker...',
+            'resume': resume
+        })
         
-        # Start async setup
-        thread = threading.Thread(
-            target=setup_domain_async,
-            args=(domain, task_id, account_key)
+        # Queue async setup; the scheduler bounds per-account and global concurrency
+        queue_position = setup_scheduler.submit(
+            task_id,
+            account_key,
+            lambda cancel_event, domain=domain, task_id=task_id: setup_domain_async(
+                domain, task_id, account_key, cancel_event, resume, certificate_packs.get(domain), validation_mode
+            )
         )
-        thread.start()
         
         tasks.append({
             'task_id': task_id,
             'domain': domain,
-            'account': Config.AWS_ACCOUNTS[account_key]['name']
+            'account': Config.AWS_ACCOUNTS[account_key]['name'],
+            'queue_position': queue_position
         })
+        if domain in certificate_packs:
+            tasks[-1]['certificate_pack'] = certificate_packs[domain].domains
     
     return jsonify({
         'tasks': tasks,
@@ -302,10 +417,89 @@ def setup_domain():
 @app.route('/api/status/<task_id>', methods=['GET'])
 def get_status(task_id):
     """Get status of domain setup"""
-    if task_id not in domain_status:
+    status = task_store.get(task_id)
+    if status is None:
         return jsonify({'error': 'Task not found'}), 404
     
-    return jsonify(domain_status[task_id])
+    if status.get('status') == 'queued' and task_store.is_local(task_id):
+        status['queue_position'] = setup_scheduler.position(task_id)
+    return jsonify(status)
+
+@app.route('/api/status/stream', methods=['GET'])
+def stream_status():
+    """
+    Server-Sent Events stream of progress for one or many tasks
+    (?task_ids=a,b,c). Sends a 'status' snapshot per task, then 'progress'
+    events as steps move, and a 'done' event with the final document; the
+    stream ends once every task has finished.
+    """
+    task_ids = [t.strip() for t in request.args.get('task_ids', '').split(',') if t.strip()]
+    if not task_ids:
+        return jsonify({'error': 'task_ids is required'}), 400
+
+    def generate():
+        subscription = task_events.subscribe(task_ids)
+        try:
+            remaining = set()
+            snapshots = {}
+            for task_id in task_ids:
+                status = task_store.get(task_id)
+                if status is None:
+                    yield format_sse('error', {'task_id': task_id, 'error': 'Task not found'})
+                    continue
+                snapshots[task_id] = status
+                yield format_sse('status', dict(status, task_id=task_id))
+                if status.get('status') in FINISHED_STATUSES:
+                    yield format_sse('done', dict(status, task_id=task_id))
+                else:
+                    remaining.add(task_id)
+
+            while remaining:
+                try:
+                    event = subscription.get(timeout=Config.SSE_KEEPALIVE_INTERVAL)
+                except queue.Empty:
+                    # Tasks running in another worker process only show up in the store
+                    for task_id in list(remaining):
+                        if task_store.is_local(task_id):
+                            continue
+                        status = task_store.get(task_id)
+                        if status is not None and status != snapshots.get(task_id):
+                            snapshots[task_id] = status
+                            finished = status.get('status') in FINISHED_STATUSES
+                            yield format_sse('done' if finished else 'status', dict(status, task_id=task_id))
+                            if finished:
+                                remaining.discard(task_id)
+                    yield ': keepalive\n\n'
+                    continue
+
+                if event.get('type') == 'done':
+                    remaining.discard(event['task_id'])
+                    yield format_sse('done', dict(event['document'], task_id=event['task_id']))
+                else:
+                    yield format_sse('progress', event)
+        finally:
+            task_events.unsubscribe(subscription)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/cancel/<task_id>', methods=['POST'])
+def cancel_task(task_id):
+    """Cancel a queued or running domain setup"""
+    previous_state = cancel_local_task(task_id)
+    if previous_state is None:
+        # Not running in this worker process: flag it for the owning one
+        status = task_store.get(task_id)
+        if status is None:
+            return jsonify({'error': 'Task not found'}), 404
+        if not task_store.request_cancel(task_id):
+            return jsonify({'error': 'Task already finished'}), 409
+        return jsonify({'task_id': task_id, 'previous_state': status.get('status')}), 202
+    
+    return jsonify({'task_id': task_id, 'previous_state': previous_state})
 
 @app.route('/api/buckets/<account_key>', methods=['GET'])
 def get_buckets(account_key):
@@ -315,19 +509,8 @@ def get_buckets(account_key):
         if account_key not in Config.AWS_ACCOUNTS:
             return jsonify({'error': f'Invalid account: {account_key}'}), 400
             
-        # Get account credentials
-        account_config = Config.AWS_ACCOUNTS[account_key]
-        access_key_id = account_config['access_key_id']
-        secret_access_key = account_config['secret_access_key']
-        region = account_config['region']
-        
-        # Create S3 client
-        s3_client = boto3.client(
-            's3',
-            region_name=region,
-            aws_access_key_id=access_key_id,
-            aws_secret_access_key=secret_access_key
-        )
+        # Shared S3 client for this account
+        s3_client = get_s3_client(account_key)
         
         # List buckets
         response = s3_client.list_buckets()
@@ -351,19 +534,8 @@ def get_bucket_files(account_key, bucket_name):
         if account_key not in Config.AWS_ACCOUNTS:
             return jsonify({'error': f'Invalid account: {account_key}'}), 400
             
-        # Get account credentials
-        account_config = Config.AWS_ACCOUNTS[account_key]
-        access_key_id = account_config['access_key_id']
-        secret_access_key = account_config['secret_access_key']
-        region = account_config['region']
-        
-        # Create S3 client
-        s3_client = boto3.client(
-            's3',
-            region_name=region,
-            aws_access_key_id=access_key_id,
-            aws_secret_access_key=secret_access_key
-        )
+        # Shared S3 client for this account
+        s3_client = get_s3_client(account_key)
         
         # List objects in bucket
         try:
@@ -405,19 +577,8 @@ def replace_script():
         if account_key not in Config.AWS_ACCOUNTS:
             return jsonify({'error': f'Invalid account: {account_key}'}), 400
             
-        # Get account credentials
-        account_config = Config.AWS_ACCOUNTS[account_key]
-        access_key_id = account_config['access_key_id']
-        secret_access_key = account_config['secret_access_key']
-        region = account_config['region']
-        
-        # Create S3 client
-        s3_client = boto3.client(
-            's3',
-            region_name=region,
-            aws_access_key_id=access_key_id,
-            aws_secret_access_key=secret_access_key
-        )
+        # Shared S3 client for this account
+        s3_client = get_s3_client(account_key)
         
         # Verify the file exists
         try:
@@ -469,19 +630,8 @@ def add_script():
         if account_key not in Config.AWS_ACCOUNTS:
             return jsonify({'error': f'Invalid account: {account_key}'}), 400
             
-        # Get account credentials
-        account_config = Config.AWS_ACCOUNTS[account_key]
-        access_key_id = account_config['access_key_id']
-        secret_access_key = account_config['secret_access_key']
-        region = account_config['region']
-        
-        # Create S3 client
-        s3_client = boto3.client(
-            's3',
-            region_name=region,
-            aws_access_key_id=access_key_id,
-            aws_secret_access_key=secret_access_key
-        )
+        # Shared S3 client for this account
+        s3_client = get_s3_client(account_key)
         
         # Verify the file exists
         try:
@@ -532,19 +682,8 @@ def get_bucket_contents(account_key, bucket_name):
         if account_key not in Config.AWS_ACCOUNTS:
             return jsonify({'error': f'Invalid account: {account_key}'}), 400
             
-        # Get account credentials
-        account_config = Config.AWS_ACCOUNTS[account_key]
-        access_key_id = account_config['access_key_id']
-        secret_access_key = account_config['secret_access_key']
-        region = account_config['region']
-        
-        # Create S3 client
-        s3_client = boto3.client(
-            's3',
-            region_name=region,
-            aws_access_key_id=access_key_id,
-            aws_secret_access_key=secret_access_key
-        )
+        # Shared S3 client for this account
+        s3_client = get_s3_client(account_key)
         
         # Get prefix from query parameters
         prefix = request.args.get('prefix', '')
@@ -629,6 +768,7 @@ def replace_domain_in_content(content, source_bucket, target_bucket, source_doma
     return content
 
 @app.route('/api/copy-files', methods=['POST'])
+@tracked_api_calls('copy-files')
 def copy_files():
     try:
         data = request.json
@@ -675,22 +815,9 @@ def copy_files():
         if source_account not in Config.AWS_ACCOUNTS or target_account not in Config.AWS_ACCOUNTS:
             return jsonify({'error': 'Invalid account(s)'}), 400
         
-        # Create S3 clients for source and target accounts
-        source_config = Config.AWS_ACCOUNTS[source_account]
-        source_s3 = boto3.client(
-            's3',
-            aws_access_key_id=source_config['access_key_id'],
-            aws_secret_access_key=source_config['secret_access_key'],
-            region_name=source_config['region']
-        )
-        
-        target_config = Config.AWS_ACCOUNTS[target_account]
-        target_s3 = boto3.client(
-            's3',
-            aws_access_key_id=target_config['access_key_id'],
-            aws_secret_access_key=target_config['secret_access_key'],
-            region_name=target_config['region']
-        )
+        # Shared S3 clients for source and target accounts
+        source_s3 = get_s3_client(source_account)
+        target_s3 = get_s3_client(target_account)
         
         # CHECK FOR EXISTING FOLDERS IN TARGET BUCKET
         existing_folders = []
@@ -806,7 +933,8 @@ def copy_files():
                 continue                  
 
         return jsonify({             
-            'message': f'Successfully copied {len(files_to_copy)} files from {source_bucket} to {target_bucket}'         
+            'message': f'Successfully copied {len(files_to_copy)} files from {source_bucket} to {target_bucket}',
+            'api_calls': current_counter().summary()
         })              
 
     except Exception as e:         
@@ -828,19 +956,8 @@ def save_file_content():
         if account_key not in Config.AWS_ACCOUNTS:
             return jsonify({'error': f'Invalid account: {account_key}'}), 400
             
-        # Get account credentials
-        account_config = Config.AWS_ACCOUNTS[account_key]
-        access_key_id = account_config['access_key_id']
-        secret_access_key = account_config['secret_access_key']
-        region = account_config['region']
-        
-        # Create S3 client
-        s3_client = boto3.client(
-            's3',
-            region_name=region,
-            aws_access_key_id=access_key_id,
-            aws_secret_access_key=secret_access_key
-        )
+        # Shared S3 client for this account
+        s3_client = get_s3_client(account_key)
         
         # Upload content to S3
         s3_client.put_object(
@@ -865,19 +982,8 @@ def get_file_content(account_key, bucket_name, file_key):
         if account_key not in Config.AWS_ACCOUNTS:
             return jsonify({'error': f'Invalid account: {account_key}'}), 400
             
-        # Get account credentials
-        account_config = Config.AWS_ACCOUNTS[account_key]
-        access_key_id = account_config['access_key_id']
-        secret_access_key = account_config['secret_access_key']
-        region = account_config['region']
-        
-        # Create S3 client
-        s3_client = boto3.client(
-            's3',
-            region_name=region,
-            aws_access_key_id=access_key_id,
-            aws_secret_access_key=secret_access_key
-        )
+        # Shared S3 client for this account
+        s3_client = get_s3_client(account_key)
         
         # Get file content
         try:
@@ -0,0 +1,259 @@
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Awaitable, Dict, List, Optional, Tuple
+
+from aws_automation import AWSAutomation
+from certificate_packs import CertificatePack, validation_records_by_domain
+from config import Config
+from domain_setup import DomainSetup
+from step_graph import AsyncStepGraph
+from waiters import AdaptiveWaiter, WaiterTimeout, cname_records_visible
+
+
+async def run_blocking(executor: ThreadPoolExecutor, func, *args, **kwargs):
+    """Run a blocking call on `executor` in a copy of the current context (keeps API call attribution)"""
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        executor, functools.partial(context.run, func, *args, **kwargs)
+    )
+
+
+class ExecutorAdapter:
+    """Awaitable view of an object: every method call runs on the executor"""
+
+    def __init__(self, target, executor: ThreadPoolExecutor):
+        self._target = target
+        self._executor = executor
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        if not callable(attribute):
+            return attribute
+
+        async def call(*args, **kwargs):
+            return await run_blocking(self._executor, attribute, *args, **kwargs)
+        return call
+
+
+class AsyncAWSAutomation:
+    """
+    asyncio engine for domain_setup.DomainSetup: the same steps as
+    AWSAutomation.setup_domain, with every blocking call awaited.
+
+    Single API calls run on a shared AWS executor (the shared boto3 clients,
+    with their rate limits and instrumentation, are reused as is); Namecheap
+    calls run on a separate small executor, since they queue on the Namecheap
+    rate limiter. Every wait - validation records, DNS propagation, ACM
+    validation (through the account's ResourceWatcher), S3 policy
+    propagation - is awaited, so an in-flight setup holds no thread between
+    calls.
+    """
+
+    def __init__(self, automation: AWSAutomation, aws_executor: ThreadPoolExecutor,
+                 namecheap_executor: ThreadPoolExecutor):
+        self.automation = automation
+        self.account_key = automation.account_key
+        self.aws_executor = aws_executor
+        self.aws = ExecutorAdapter(automation, aws_executor)
+        self.namecheap = ExecutorAdapter(automation, namecheap_executor)
+        self.acm = ExecutorAdapter(automation.acm_client, aws_executor)
+
+    async def request_certificate(self, domain: str) -> Tuple[str, List[Dict]]:
+        existing_cert = await self.aws.check_existing_certificate(domain)
+        if existing_cert:
+            return existing_cert, []
+
+        certificate_arn = await self.aws.start_certificate_request(domain)
+        waiter = AdaptiveWaiter(initial_delay=1, max_delay=5, timeout=Config.CERT_RECORDS_TIMEOUT)
+        try:
+            validation_records = await waiter.wait_async(
+                lambda: self.aws.certificate_validation_records(certificate_arn),
+                description='validation records',
+                on_attempt=lambda attempt, elapsed: print(f"Attempt {attempt}: validation records not ready yet ({elapsed:.0f}s)")
+            )
+        except WaiterTimeout:
+            raise Exception("Failed to get validation records from AWS")
+
+        print(f"Total validation records found: {len(validation_records)}")
+        return certificate_arn, validation_records
+
+    async def request_packed_certificate(self, pack: CertificatePack,
+                                         route53_zone_ids: Dict[str, str] = None) -> Dict[str, Dict]:
+        """See AWSAutomation.request_packed_certificate"""
+        existing = await asyncio.gather(*(self.aws.check_existing_certificate(domain) for domain in pack.domains))
+        packed = {domain: {'certificate_arn': cert_arn, 'validation_records': []}
+                  for domain, cert_arn in zip(pack.domains, existing) if cert_arn}
+        new_domains = [domain for domain in pack.domains if domain not in packed]
+        if not new_domains:
+            return packed
+
+        certificate_arn = await self.aws.start_certificate_request(new_domains[0], new_domains[1:])
+        waiter = AdaptiveWaiter(initial_delay=1, max_delay=5, timeout=Config.CERT_RECORDS_TIMEOUT)
+        try:
+            validation_records = await waiter.wait_async(
+                lambda: self.aws.certificate_validation_records(certificate_arn),
+                description='validation records'
+            )
+        except WaiterTimeout:
+            raise Exception("Failed to get validation records from AWS")
+
+        by_domain = validation_records_by_domain(validation_records, new_domains)
+        if route53_zone_ids is None:
+            written = await asyncio.gather(*(self.namecheap.add_namecheap_cname_records(domain, records)
+                                             for domain, records in by_domain.items()))
+            key = 'namecheap_cname_updated'
+        else:
+            written = await asyncio.gather(*(
+                self.aws.upsert_validation_records(route53_zone_ids[domain], domain, records)
+                if domain in route53_zone_ids else asyncio.sleep(0)
+                for domain, records in by_domain.items()
+            ))
+            key = 'validation_change_id'
+        for (domain, records), value in zip(by_domain.items(), written):
+            packed[domain] = {'certificate_arn': certificate_arn, 'validation_records': records, key: value}
+        return packed
+
+    async def setup_s3_buckets(self, domain: str) -> str:
+        """Same phases as AWSAutomation.setup_s3_buckets, as concurrent coroutines"""
+        await asyncio.gather(self.aws._create_bucket(domain), self.aws._create_bucket(f'www.{domain}'))
+        await asyncio.gather(
+            self._make_bucket_public(domain),
+            self.aws._configure_main_website(domain),
+            self.aws._configure_www_redirect(domain),
+        )
+        return await self.aws._buckets_ready(domain)
+
+    async def _make_bucket_public(self, domain: str):
+        await self.aws._disable_public_access_block(domain)
+        policy = self.automation._public_read_policy(domain)
+        last_error = []
+
+        async def try_put_policy():
+            error = await self.aws.try_put_bucket_policy(domain, policy)
+            last_error[:] = [error] if error else []
+            return error is None
+
+        waiter = AdaptiveWaiter(initial_delay=0.5, max_delay=4, timeout=Config.S3_POLICY_TIMEOUT)
+        try:
+            await waiter.wait_async(try_put_policy, description=f'public access settings on {domain}')
+        except WaiterTimeout:
+            raise last_error[0]
+
+    async def wait_for_certificate_validation(self, certificate_arn: str, timeout: int = 600,
+                                              validation_records: List[Dict] = None):
+        cert_details = await self.acm.describe_certificate(CertificateArn=certificate_arn)
+        if cert_details['Certificate']['Status'] == 'ISSUED':
+            print(f"Certificate {certificate_arn} is already validated")
+            return
+
+        start_time = time.time()
+        dns_resolver = self.automation.dns_resolver
+        if validation_records and dns_resolver is not None:
+            dns_waiter = AdaptiveWaiter(initial_delay=2, max_delay=15, timeout=min(Config.DNS_PROPAGATION_TIMEOUT, timeout))
+            try:
+                await dns_waiter.wait_async(
+                    lambda: run_blocking(self.aws_executor, cname_records_visible, dns_resolver, validation_records),
+                    description='validation CNAME records in DNS'
+                )
+                print(f"Validation CNAME records are visible in DNS after {time.time() - start_time:.0f}s")
+            except WaiterTimeout:
+                print("Validation CNAME records not visible yet, polling ACM anyway")
+
+        remaining = max(timeout - (time.time() - start_time), 0)
+        try:
+            certificate = await self.automation.resource_watcher.wait_async('certificate', certificate_arn,
+                                                                            timeout=remaining)
+        except TimeoutError:
+            raise TimeoutError(f"Certificate validation timed out after {timeout} seconds")
+        await self.aws.certificate_validated(certificate_arn, certificate)
+
+    # DomainSetup engine operations
+
+    async def blocking(self, func, *args, **kwargs):
+        return await run_blocking(self.aws_executor, func, *args, **kwargs)
+
+    async def wait_for(self, kind: str, resource_id: str, timeout: float):
+        return await self.automation.resource_watcher.wait_async(kind, resource_id, timeout=timeout)
+
+    async def run_once(self, pack: CertificatePack, phase, func):
+        return await pack.run_once_async(phase, func)
+
+    async def gather(self, *awaitables: Awaitable) -> List:
+        return await asyncio.gather(*awaitables, return_exceptions=True)
+
+    async def run_graph(self, steps) -> Dict:
+        graph = AsyncStepGraph()
+        for key, func, depends_on in steps:
+            graph.add(key, func, depends_on=depends_on)
+        return await graph.run()
+
+    async def setup_domain(self, domain: str, progress_callback=None, checkpoints=None, resume: bool = False,
+                           certificate_pack: CertificatePack = None, validation_mode: str = None) -> Dict:
+        """See AWSAutomation.setup_domain; runs the same DomainSetup steps and returns the same result document"""
+        setup = DomainSetup(self, domain, progress_callback=progress_callback, checkpoints=checkpoints,
+                            resume=resume, certificate_pack=certificate_pack, validation_mode=validation_mode)
+        return await setup.run()
+
+
+class AsyncSetupRunner:
+    """
+    One event loop thread driving every asyncio-engine setup of the process,
+    plus the executors their blocking API calls run on.
+    """
+
+    def __init__(self, aws_workers: int = None, namecheap_workers: int = None):
+        self.aws_workers = aws_workers or Config.ASYNC_SETUP_AWS_WORKERS
+        self.namecheap_workers = namecheap_workers or Config.NAMECHEAP_POOL_SIZE
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_pid = None
+        self._lock = threading.Lock()
+        self._automations: Dict[str, AsyncAWSAutomation] = {}
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        # Threads do not survive a fork, so each worker process starts its own loop
+        with self._lock:
+            if self._loop_pid != os.getpid():
+                self._loop = asyncio.new_event_loop()
+                self._loop_pid = os.getpid()
+                self._automations = {}
+                self.aws_executor = ThreadPoolExecutor(self.aws_workers, thread_name_prefix='async-setup-aws')
+                self.namecheap_executor = ThreadPoolExecutor(self.namecheap_workers,
+                                                             thread_name_prefix='async-setup-namecheap')
+                threading.Thread(target=self._loop.run_forever, daemon=True, name='async-setup-loop').start()
+            return self._loop
+
+    def automation(self, account_key: str) -> AsyncAWSAutomation:
+        self._ensure_loop()
+        with self._lock:
+            instance = self._automations.get(account_key)
+            if instance is None:
+                instance = AsyncAWSAutomation(AWSAutomation.for_account(account_key),
+                                              self.aws_executor, self.namecheap_executor)
+                self._automations[account_key] = instance
+            return instance
+
+    async def run_blocking(self, func, *args, **kwargs):
+        """Await a blocking call (e.g. a task store write) on the AWS executor, off the loop thread"""
+        return await run_blocking(self.aws_executor, func, *args, **kwargs)
+
+    def submit(self, coroutine: Awaitable) -> Future:
+        """Schedule a coroutine on the loop thread; the returned future resolves with its result"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._ensure_loop())
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_setup_runner() -> AsyncSetupRunner:
+    """Process-wide runner for the asyncio setup engine"""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = AsyncSetupRunner()
+        return _runner
@@ -1,35 +1,270 @@
-import boto3
+import contextvars
 import json
+import threading
 import time
 import requests
 import xml.etree.ElementTree as ET
-from typing import Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 from config import Config
+from aws_clients import get_client, get_s3_client
+from aws_indexes import CertificateIndex, DistributionAliasIndex
+from aws_inventory import get_inventory
+from resource_watcher import get_resource_watcher
+from certificate_packs import CertificatePack, validation_records_by_domain
+from domain_setup import BlockingSetupEngine, DomainSetup, run_to_completion
+from waiters import AdaptiveWaiter, WaiterTimeout, cname_records_visible, default_dns_resolver
+from rate_limit import RateLimiter, TokenBucket
+import api_accounting
+import metrics
+from botocore.exceptions import ClientError
+from requests.adapters import HTTPAdapter
 import io
+import os
+
+
+class NamecheapThrottled(Exception):
+    """Namecheap rejected a call because the API rate limit was exceeded"""
+
+
+class NamecheapTransport:
+    """
+    Process-wide HTTP transport for the Namecheap API.
+
+    All NamecheapManager instances share one keep-alive requests.Session through
+    the proxy and one rate limiter, so concurrent domain setups stay under
+    Namecheap's per-minute and per-hour limits together. Throttled calls (HTTP
+    429/503 or a throttling error code in the XML) and connection errors are
+    retried with exponential backoff; a throttle also drains the limiter so the
+    other threads back off too.
+    """
+
+    RETRY_STATUS_CODES = (429, 502, 503, 504)
+
+    def __init__(self, rate_limiter: RateLimiter, pool_size: int, max_retries: int, throttle_error_codes: List[str]):
+        self.rate_limiter = rate_limiter
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.throttle_error_codes = set(throttle_error_codes)
+        self._session = None
+        self._session_pid = None
+        self._lock = threading.Lock()
+
+    def session(self) -> requests.Session:
+        # Rebuilt after a fork so workers never share pooled sockets
+        with self._lock:
+            if self._session is None or self._session_pid != os.getpid():
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.pool_size)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.proxies.update(Config.get_proxy())
+                self._session = session
+                self._session_pid = os.getpid()
+            return self._session
+
+    def _throttled(self, response: requests.Response) -> bool:
+        if response.status_code in self.RETRY_STATUS_CODES:
+            return True
+        if response.status_code != 200 or '<Errors' not in response.text:
+            return False
+        try:
+            root = ET.fromstring(response.text)
+        except ET.ParseError:
+            return False
+        for error in root.findall('.//Errors/Error'):
+            if error.get('Number') in self.throttle_error_codes or 'too many requests' in (error.text or '').lower():
+                return True
+        return False
+
+    def request(self, method: str, params: Dict, timeout: float) -> requests.Response:
+        """Rate-limited API call; returns the first non-throttled response"""
+        delays = AdaptiveWaiter(initial_delay=2, max_delay=60).delays()
+        attempt = 0
+        command = params.get('Command', '')
+        while True:
+            attempt += 1
+            waited_from = time.monotonic()
+            self.rate_limiter.acquire()
+            started_at = time.monotonic()
+            metrics.NAMECHEAP_RATE_LIMIT_WAIT.observe(started_at - waited_from)
+            try:
+                api_accounting.record('namecheap', 'calls' if attempt == 1 else 'retries')
+                if method == 'GET':
+                    response = self.session().get(Config.NAMECHEAP_API_URL, params=params, timeout=timeout)
+                else:
+                    response = self.session().post(Config.NAMECHEAP_API_URL, data=params, timeout=timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                metrics.NAMECHEAP_API_DURATION.labels(command, 'exception').observe(time.monotonic() - started_at)
+                api_accounting.record('namecheap', 'errors')
+                if attempt > self.max_retries:
+                    raise
+                metrics.NAMECHEAP_API_RETRIES.labels(command, 'connection').inc()
+                reason = f"connection error: {e}"
+            else:
+                throttled = self._throttled(response)
+                metrics.NAMECHEAP_API_DURATION.labels(command, 'throttled' if throttled else 'ok').observe(
+                    time.monotonic() - started_at
+                )
+                if not throttled:
+                    return response
+                metrics.NAMECHEAP_API_THROTTLES.labels(command).inc()
+                api_accounting.record('namecheap', 'throttles')
+                if attempt > self.max_retries:
+                    raise NamecheapThrottled(
+                        f"{params.get('Command')} still throttled after {attempt} attempts (HTTP {response.status_code})"
+                    )
+                self.rate_limiter.drain()
+                metrics.NAMECHEAP_API_RETRIES.labels(command, 'throttled').inc()
+                reason = f"throttled (HTTP {response.status_code})"
+
+            delay = next(delays)
+            print(f"   ⏳ Namecheap {params.get('Command')} {reason}; retrying in {delay:.1f}s "
+                  f"(attempt {attempt}/{self.max_retries})")
+            time.sleep(delay)
+
+
+namecheap_transport = NamecheapTransport(
+    RateLimiter([
+        TokenBucket(Config.NAMECHEAP_RATE_PER_MINUTE, per=60),
+        TokenBucket(Config.NAMECHEAP_RATE_PER_HOUR, per=3600),
+    ]),
+    pool_size=Config.NAMECHEAP_POOL_SIZE,
+    max_retries=Config.NAMECHEAP_MAX_RETRIES,
+    throttle_error_codes=[code.strip() for code in Config.NAMECHEAP_THROTTLE_ERROR_CODES.split(',') if code.strip()],
+)
+
+
+def detect_client_ip(session: requests.Session = None) -> str:
+    """Ask ipify for the public IP the Namecheap API will see"""
+    response = (session or namecheap_transport.session()).get('https://api.ipify.org', timeout=5)
+    response.raise_for_status()
+    return response.text.strip()
+
+
+class ClientIPCache:
+    """
+    Process-wide cache of the Namecheap client IP.
+
+    The value is refreshed in a background thread once it is older than the TTL,
+    so callers only ever block on the very first detection.
+    """
+
+    FALLBACK_IP = '127.0.0.1'
+
+    def __init__(self, fetch, ttl: int):
+        self.fetch = fetch
+        self.ttl = ttl
+        self._ip = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = None  # threading.Event while a refresh is running
+
+    def _refresh(self, done: threading.Event):
+        try:
+            ip = self.fetch()
+            with self._lock:
+                self._ip = ip
+                self._fetched_at = time.time()
+            print(f"🌐 Namecheap client IP detected: {ip}")
+        except Exception as e:
+            print(f"❌ Could not detect IP: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = None
+            done.set()
+
+    def refresh_in_background(self) -> threading.Event:
+        """Start a refresh unless one is already running; returns its completion event"""
+        with self._lock:
+            if self._refreshing is not None:
+                return self._refreshing
+            done = threading.Event()
+            self._refreshing = done
+        threading.Thread(target=self._refresh, args=(done,), daemon=True).start()
+        return done
+
+    def get(self) -> str:
+        if Config.NAMECHEAP_CLIENT_IP:
+            return Config.NAMECHEAP_CLIENT_IP
+
+        with self._lock:
+            ip = self._ip
+            stale = time.time() - self._fetched_at > self.ttl
+
+        if ip is not None:
+            if stale:
+                self.refresh_in_background()
+            return ip
+
+        # Nothing cached yet: this is the only case that waits on ipify
+        self.refresh_in_background().wait(timeout=10)
+        with self._lock:
+            return self._ip or self.FALLBACK_IP
+
+
+client_ip_cache = ClientIPCache(detect_client_ip, Config.NAMECHEAP_CLIENT_IP_TTL)
+
 
 class NamecheapManager:
+    # Serializes host-record writes per domain across threads and instances
+    _domain_locks: Dict[str, threading.Lock] = {}
+    _domain_locks_guard = threading.Lock()
+    # domain -> (fetched_at, host records); short-lived, written through on every successful setHosts
+    _hosts_cache: Dict[str, Tuple[float, List[Dict]]] = {}
+    _hosts_cache_lock = threading.Lock()
+
     def __init__(self, config):
         self.api_user = config.NAMECHEAP_API_USER
         self.proxies = Config.get_proxy()
         self.api_key = config.NAMECHEAP_API_KEY
-        self.api_url = 'https://api.namecheap.com/xml.response'
+        self.api_url = Config.NAMECHEAP_API_URL
+        self.transport = namecheap_transport
         
-        # Get client IP immediately
-        self.client_ip = self.get_client_ip()
-        print(f"🌐 Namecheap API initialized with IP: {self.client_ip}")
+        # Detect the client IP in the background; API calls read it from the cache
+        if not Config.NAMECHEAP_CLIENT_IP:
+            client_ip_cache.refresh_in_background()
+        print("🌐 Namecheap API initialized")
+
+    @property
+    def client_ip(self) -> str:
+        return client_ip_cache.get()
     
     def get_client_ip(self):
         """Get the current public IP address - REQUIRED for Namecheap API"""
         try:
-            response = requests.get('https://api.ipify.org', timeout=5, proxies=self.proxies)
-            ip = response.text.strip()
-            return ip
+            return detect_client_ip(self.transport.session())
         except Exception as e:
             print(f"❌ Could not detect IP: {e}")
             return '127.0.0.1'  # Fallback
     
-    def get_dns_hosts(self, domain: str) -> List[Dict]:
-        """Get current DNS hosts for a domain"""
+    @classmethod
+    def _cache_hosts(cls, domain: str, hosts: List[Dict]):
+        with cls._hosts_cache_lock:
+            cls._hosts_cache[domain] = (time.time(), [dict(host) for host in hosts])
+
+    @classmethod
+    def invalidate_dns_hosts(cls, domain: str):
+        with cls._hosts_cache_lock:
+            cls._hosts_cache.pop(domain, None)
+
+    @classmethod
+    def cached_dns_hosts(cls, domain: str) -> Optional[List[Dict]]:
+        """Host records cached within the TTL, or None"""
+        with cls._hosts_cache_lock:
+            entry = cls._hosts_cache.get(domain)
+            if entry is None or time.time() - entry[0] > Config.NAMECHEAP_HOSTS_CACHE_TTL:
+                return None
+            return [dict(host) for host in entry[1]]
+
+    def get_dns_hosts(self, domain: str, use_cache: bool = True) -> List[Dict]:
+        """Get current DNS hosts for a domain (served from the short-lived cache when fresh)"""
+        if use_cache:
+            hosts = self.cached_dns_hosts(domain)
+            if hosts is not None:
+                print(f"\n🔍 Using cached DNS hosts for domain: {domain} ({len(hosts)} records)")
+                return hosts
+
         print(f"\n🔍 Getting DNS hosts for domain: {domain}")
         
         params = {
@@ -45,7 +280,7 @@ class NamecheapManager:
         print(f"   API params: SLD='{params['SLD']}', TLD='{params['TLD']}', IP='{self.client_ip}'")
         
         try:
-            response = requests.get(self.api_url, params=params, timeout=15, proxies=self.proxies)
+            response = self.transport.request('GET', params, timeout=15)
             print(f"   API response status: {response.status_code}")
             
             if response.status_code != 200:
@@ -84,6 +319,7 @@ class NamecheapManager:
                 print(f"   Found host: {host_data}")
             
             print(f"   ✅ Total hosts found: {len(hosts)}")
+            self._cache_hosts(domain, hosts)
             return hosts
             
         except Exception as e:
@@ -115,7 +351,7 @@ class NamecheapManager:
         
         try:
             print(f"   🌐 Making API call to Namecheap...")
-            response = requests.post(self.api_url, data=params, timeout=30, proxies=self.proxies)
+            response = self.transport.request('POST', params, timeout=30)
             
             print(f"   Response status: {response.status_code}")
             
@@ -148,14 +384,17 @@ class NamecheapManager:
             success = root.find('.//DomainDNSSetHostsResult')
             if success is not None and success.get('IsSuccess', '').lower() == 'true':
                 print(f"   ✅ DNS hosts updated successfully!")
+                self._cache_hosts(domain, [dict(host, TTL=host.get('TTL', '1800')) for host in hosts])
                 return True
             else:
+                self.invalidate_dns_hosts(domain)
                 print(f"   ❌ DNS update failed (IsSuccess != true)")
                 # Print the full response for debugging
                 print(f"   Full response: {response.text}")
                 return False
                 
         except Exception as e:
+            self.invalidate_dns_hosts(domain)
             print(f"   ❌ Error setting DNS hosts: {str(e)}")
             raise
     
@@ -178,9 +417,12 @@ class NamecheapManager:
         print(f"   Domain parts: SLD='{params['SLD']}', TLD='{params['TLD']}'")
         print(f"   Client IP: {self.client_ip}")
         
+        # Namecheap no longer serves the host records once custom nameservers are set
+        self.invalidate_dns_hosts(domain)
+        
         try:
             print(f"   🌐 Making API call to set custom nameservers...")
-            response = requests.post(self.api_url, data=params, timeout=30, proxies=self.proxies)
+            response = self.transport.request('POST', params, timeout=30)
             
             print(f"   Response status: {response.status_code}")
             
@@ -224,12 +466,18 @@ class NamecheapManager:
             traceback.print_exc()
             return False
     
-    def add_cname_record(self, domain: str, host_name: str, host_value: str):
-        """Add CNAME record for SSL validation - FIXED VERSION"""
-        print(f"\n➕ Adding CNAME record for domain: {domain}")
-        print(f"   Original host_name: {host_name}")
-        print(f"   Host value: {host_value}")
-        
+    @classmethod
+    def _domain_lock(cls, domain: str) -> threading.Lock:
+        """One lock per domain: getHosts/setHosts is read-modify-write"""
+        with cls._domain_locks_guard:
+            lock = cls._domain_locks.get(domain)
+            if lock is None:
+                lock = cls._domain_locks[domain] = threading.Lock()
+            return lock
+
+    @staticmethod
+    def relative_host_name(domain: str, host_name: str) -> str:
+        """Turn '_abc.example.com.' into the Namecheap host name '_abc'"""
         # Remove trailing dot
         host_name = host_name.rstrip('.')
         
@@ -238,47 +486,74 @@ class NamecheapManager:
             host_name = host_name.replace(f'.{domain}', '')
         elif host_name.endswith(domain):
             host_name = host_name.replace(domain, '').rstrip('.')
+        return host_name
+
+    def upsert_cname_records(self, domain: str, records: List[Dict], ttl: str = '60') -> bool:
+        """
+        Add or update several CNAME records ({'name', 'value'}) for a domain in a
+        single getHosts/setHosts cycle. The write is skipped when every record is
+        already in place, and writes to the same domain are serialized. Under the
+        domain lock the hosts come from the short-lived cache, which every
+        successful setHosts writes through, so repeated upserts on a domain cost
+        one getHosts; changes made elsewhere are picked up once the entry
+        expires (NAMECHEAP_HOSTS_CACHE_TTL).
+        """
+        print(f"\n➕ Upserting {len(records)} CNAME record(s) for domain: {domain}")
         
-        print(f"   Processed host_name: {host_name}")
+        wanted = {}
+        for record in records:
+            wanted[self.relative_host_name(domain, record['name'])] = record['value']
         
-        try:
-            # Get existing hosts first
-            existing_hosts = self.get_dns_hosts(domain)
-            print(f"   Found {len(existing_hosts)} existing DNS records")
-            
-            # Check if CNAME already exists and update or add
-            cname_exists = False
-            for i, host in enumerate(existing_hosts):
-                if host['Type'] == 'CNAME' and host['Name'] == host_name:
-                    print(f"   🔄 CNAME record already exists for {host_name}, updating value")
-                    existing_hosts[i]['Address'] = host_value
-                    existing_hosts[i]['TTL'] = '60'
-                    cname_exists = True
-                    break
-            
-            if not cname_exists:
-                # Add new CNAME record
-                new_record = {
-                    'Name': host_name,
-                    'Type': 'CNAME',
-                    'Address': host_value,
-                    'TTL': '60'
-                }
-                existing_hosts.append(new_record)
-                print(f"   ➕ Adding new CNAME record: {new_record}")
-            
-            # Update all hosts
-            print(f"   📤 Updating DNS with {len(existing_hosts)} total records")
-            success = self.set_dns_hosts(domain, existing_hosts)
-            
-            if success:
-                print(f"   ✅ Successfully updated DNS records for {domain}")
-            else:
-                raise Exception("Failed to update DNS records")
+        with self._domain_lock(domain):
+            try:
+                # Cached hosts are current for this process: every write under this lock updates them
+                existing_hosts = self.get_dns_hosts(domain)
+                print(f"   Found {len(existing_hosts)} existing DNS records")
                 
-        except Exception as e:
-            print(f"   ❌ Error in add_cname_record: {str(e)}")
-            raise
+                changed = False
+                for host_name, host_value in wanted.items():
+                    current = next(
+                        (host for host in existing_hosts if host['Type'] == 'CNAME' and host['Name'] == host_name),
+                        None
+                    )
+                    if current is None:
+                        new_record = {
+                            'Name': host_name,
+                            'Type': 'CNAME',
+                            'Address': host_value,
+                            'TTL': ttl
+                        }
+                        existing_hosts.append(new_record)
+                        print(f"   ➕ Adding new CNAME record: {new_record}")
+                        changed = True
+                    elif current['Address'].rstrip('.').lower() != host_value.rstrip('.').lower() or current['TTL'] != ttl:
+                        print(f"   🔄 CNAME record already exists for {host_name}, updating value")
+                        current['Address'] = host_value
+                        current['TTL'] = ttl
+                        changed = True
+                    else:
+                        print(f"   ✔️ CNAME record for {host_name} already up to date")
+                
+                if not changed:
+                    print(f"   ⏭️ No DNS changes needed for {domain}")
+                    return True
+                
+                # Update all hosts
+                print(f"   📤 Updating DNS with {len(existing_hosts)} total records")
+                success = self.set_dns_hosts(domain, existing_hosts)
+                
+                if success:
+                    print(f"   ✅ Successfully updated DNS records for {domain}")
+                    return True
+                raise Exception("Failed to update DNS records")
+                    
+            except Exception as e:
+                print(f"   ❌ Error in upsert_cname_records: {str(e)}")
+                raise
+
+    def add_cname_record(self, domain: str, host_name: str, host_value: str):
+        """Add CNAME record for SSL validation - FIXED VERSION"""
+        self.upsert_cname_records(domain, [{'name': host_name, 'value': host_value}])
 
 
 # Updated config template
@@ -315,6 +590,29 @@ print("")
 print("🎯 Most likely issue: IP not whitelisted in Namecheap!")
 
 class AWSAutomation:
+    # Process-wide instances, one per account (see for_account)
+    _instances: Dict[str, 'AWSAutomation'] = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def for_account(cls, account_key: str = 'auto-insurance') -> 'AWSAutomation':
+        """
+        Return the shared AWSAutomation for an account, building it on first use.
+
+        Instances hold only shared clients and configuration, so one instance can
+        serve any number of concurrent tasks.
+        """
+        instance = cls._instances.get(account_key)
+        if instance is not None:
+            return instance
+
+        with cls._instances_lock:
+            instance = cls._instances.get(account_key)
+            if instance is None:
+                instance = cls(account_key=account_key)
+                cls._instances[account_key] = instance
+            return instance
+
     def __init__(self, account_key='auto-insurance'):
         self.config = Config()
         self.account_key = account_key
@@ -324,43 +622,41 @@ class AWSAutomation:
             raise ValueError(f"Invalid account key: {account_key}")
             
         account_config = self.config.AWS_ACCOUNTS[account_key]
-        access_key_id = account_config['access_key_id']
-        secret_access_key = account_config['secret_access_key']
         region = account_config['region']
-        
-        # Initialize AWS clients with the selected account
-        self.acm_client = boto3.client(
-            'acm',
-            region_name='us-east-1',  # ACM for CloudFront must be in us-east-1
-            aws_access_key_id=access_key_id,
-            aws_secret_access_key=secret_access_key
-        )
-        self.route53_client = boto3.client(
-            'route53',
-            aws_access_key_id=access_key_id,
-            aws_secret_access_key=secret_access_key
-        )
-        self.s3_client = boto3.client(
-            's3',
-            region_name=region,
-            aws_access_key_id=access_key_id,
-            aws_secret_access_key=secret_access_key
-        )
-        self.cloudfront_client = boto3.client(
-            'cloudfront',
-            aws_access_key_id=access_key_id,
-            aws_secret_access_key=secret_access_key
-        )
+
+        # Shared, long-lived AWS clients for the selected account
+        self.acm_client = get_client(account_key, 'acm', 'us-east-1')  # ACM for CloudFront must be in us-east-1
+        self.route53_client = get_client(account_key, 'route53')
+        self.s3_client = get_s3_client(account_key)
+        self.cloudfront_client = get_client(account_key, 'cloudfront')
+
+        # Used to see validation CNAMEs before polling ACM (None disables the check)
+        self.dns_resolver = default_dns_resolver()
+
+        # SAN -> ARN index of ISSUED certificates, shared by every task on this account
+        self.certificate_index = CertificateIndex(self.acm_client)
+        # Alias -> CloudFront distribution index, written through on create
+        self.distribution_index = DistributionAliasIndex(self.cloudfront_client)
+        # Local cross-account inventory, queried before the AWS listings (None when disabled)
+        self.inventory = get_inventory()
+        # Background poller shared by every task waiting on this account's resources
+        self.resource_watcher = get_resource_watcher(account_key)
         
         # Store region for this account
         self.aws_region = region
+
+        # Shared CloudFront distributions new domains are attached to (empty = dedicated distributions)
+        self.cloudfront_pool = list(account_config.get('cloudfront_pool', []))
+        self._pool_lock = threading.Lock()
+        self._pool_router_arn = None
         
         # Initialize Namecheap manager if credentials are provided
         self.namecheap_manager = None
         if self.config.NAMECHEAP_API_KEY and self.config.NAMECHEAP_API_USER:
             self.namecheap_manager = NamecheapManager(self.config)
 
-    def setup_domain(self, domain: str, progress_callback=None) -> Dict:
+    def setup_domain(self, domain: str, progress_callback=None, checkpoints=None, resume: bool = False,
+                     certificate_pack: CertificatePack = None, validation_mode: str = None) -> Dict:
         """
         Main function to setup a domain on AWS (NO IP ADDRESS REQUIRED)
         
@@ -370,183 +666,87 @@ class AWSAutomation:
         - Automatic IP management by AWS
         - High availability and redundancy
         - SSL termination at edge locations
+
+        The steps form a dependency graph: the hosted zone and the S3 buckets are
+        set up while the certificate is requested and validated, so the total time
+        follows the critical path (certificate -> validation -> CloudFront -> records).
+
+        With a `checkpoints` store every completed step's outputs are saved per
+        domain. With `resume=True` a step whose checkpoint passes a cheap
+        verification is skipped, as long as its dependencies kept the outputs
+        they had when it was checkpointed.
+
+        With a `certificate_pack` the domain shares one multi-SAN certificate
+        with the other domains of its batch: the certificate is requested, its
+        CNAMEs pushed and its validation awaited once per pack.
+
+        `validation_mode` (default CERT_VALIDATION_MODE) picks where validation
+        CNAMEs go. 'namecheap' writes them to Namecheap DNS and delegates to
+        Route 53 last. 'route53' creates the hosted zone first, writes the
+        validation CNAMEs and the track record in one Route 53 change batch,
+        delegates the nameservers right away and waits for the change to be
+        INSYNC, keeping Namecheap record writes off the critical path. The step
+        keys are the same in both modes.
+
+        The steps themselves live in domain_setup.DomainSetup, shared with the
+        asyncio engine (async_automation.py).
+        """
+        setup = DomainSetup(BlockingSetupEngine(self), domain, progress_callback=progress_callback,
+                            checkpoints=checkpoints, resume=resume, certificate_pack=certificate_pack,
+                            validation_mode=validation_mode)
+        return run_to_completion(setup.run())
+
+    def verify_checkpoint(self, domain: str, step_key: str, checkpoint: Dict, outputs: Dict,
+                          validation_mode: str = None) -> bool:
+        """
+        Cheap check that a checkpointed step's outputs still hold in AWS/Namecheap
+        (for the certificate, under the resuming run's `validation_mode`)
         """
         try:
-            result = {
-                'domain': domain,
-                'status': 'in_progress',
-                'steps': {},
-                'namecheap_updated': False
-            }
-            
-            print(f"\n🚀 Starting domain setup for: {domain}")
-            print("ℹ️  This process uses CloudFront + Route 53 - NO IP ADDRESS REQUIRED!")
-            
-            # Step 1: Request SSL Certificate
-            if progress_callback:
-                progress_callback('Setting up SSL certificate...', 'certificate', 'in_progress')
-            cert_arn, validation_records = self.request_certificate(domain)
-            result['steps']['certificate'] = {
-                'status': 'completed',
-                'certificate_arn': cert_arn,
-                'validation_records': validation_records
-            }
-            
-            # IMMEDIATELY add CNAME records to Namecheap if new certificate
-            if validation_records:
-                if progress_callback:
-                    progress_callback('Adding CNAME records to Namecheap...', 'certificate', 'in_progress')
-                
-                print(f"\n=== Adding CNAME records for {domain} ===")
-                print(f"Number of validation records: {len(validation_records)}")
-                
-                namecheap_cname_success = self.add_namecheap_cname_records(domain, validation_records)
-                result['namecheap_cname_updated'] = namecheap_cname_success
-                
-                if namecheap_cname_success:
-                    if progress_callback:
-                        progress_callback('SSL certificate requested - CNAME records added automatically', 'certificate', 'completed')
-                    print("CNAME records added successfully, waiting for DNS propagation...")
-                    time.sleep(30)  # Reduced wait time to 30 seconds
-                else:
-                    if progress_callback:
-                        progress_callback('SSL certificate requested - manual CNAME update required', 'certificate', 'completed')
-                    print("Failed to add CNAME records automatically")
-            else:
-                if progress_callback:
-                    progress_callback('Using existing SSL certificate', 'certificate', 'completed')
-            
-            # Step 2: Create Route 53 Hosted Zone (but don't update nameservers yet)
-            if progress_callback:
-                progress_callback('Setting up Route 53 hosted zone...', 'route53_zone', 'in_progress')
-            zone_id, nameservers, is_existing = self.create_hosted_zone(domain)
-            result['steps']['route53_zone'] = {
-                'status': 'completed',
-                'zone_id': zone_id,
-                'nameservers': nameservers
-            }
-            
-            if is_existing:
-                if progress_callback:
-                    progress_callback('Using existing Route 53 hosted zone', 'route53_zone', 'completed')
-            else:
-                if progress_callback:
-                    progress_callback('Route 53 hosted zone created', 'route53_zone', 'completed')
-            
-            # Step 3: Create S3 Buckets
-            if progress_callback:
-                progress_callback('Setting up S3 buckets...', 's3_buckets', 'in_progress')
-            s3_endpoint = self.setup_s3_buckets(domain)
-            result['steps']['s3_buckets'] = {
-                'status': 'completed',
-                's3_endpoint': s3_endpoint
-            }
-            if progress_callback:
-                progress_callback('S3 buckets configured', 's3_buckets', 'completed')
-            
-            # Step 4: Wait for certificate validation (only if new certificate)
-            if validation_records:
-                if progress_callback:
-                    progress_callback('Waiting for certificate validation...', 'certificate_validation', 'in_progress')
-                self.wait_for_certificate_validation(cert_arn)
-                result['steps']['certificate_validation'] = {
-                    'status': 'completed'
-                }
-                if progress_callback:
-                    progress_callback('Certificate validated', 'certificate_validation', 'completed')
-            else:
-                result['steps']['certificate_validation'] = {
-                    'status': 'completed'
-                }
-                if progress_callback:
-                    progress_callback('Certificate already validated', 'certificate_validation', 'completed')
-            
-            # Step 5: Create CloudFront Distribution
-            if progress_callback:
-                progress_callback('Setting up CloudFront distribution...', 'cloudfront', 'in_progress')
-            cf_distribution_id, cf_domain, is_existing = self.create_cloudfront_distribution(domain, s3_endpoint, cert_arn)
-            result['steps']['cloudfront'] = {
-                'status': 'completed',
-                'distribution_id': cf_distribution_id,
-                'distribution_domain': cf_domain
-            }
-            if is_existing:
-                if progress_callback:
-                    progress_callback('Using existing CloudFront distribution', 'cloudfront', 'completed')
-            else:
-                if progress_callback:
-                    progress_callback('CloudFront distribution created', 'cloudfront', 'completed')
-            
-            # Step 6: Create Route 53 Records (ALIAS records - no IP needed!)
-            if progress_callback:
-                progress_callback('Creating Route 53 alias records...', 'route53_records', 'in_progress')
-            self.create_route53_records(zone_id, domain, cf_distribution_id)
-            result['steps']['route53_records'] = {
-                'status': 'completed'
-            }
-            if progress_callback:
-                progress_callback('Route 53 alias records created', 'route53_records', 'completed')
-            
-            # Step 7: Update Namecheap nameservers (AFTER certificate is validated)
-            if progress_callback:
-                progress_callback('Updating Namecheap nameservers...', 'nameserver_update', 'in_progress')
-            
-            print(f"\n=== Updating nameservers for {domain} ===")
-            print(f"Nameservers to set: {nameservers}")
-            
-            namecheap_ns_success = self.update_namecheap_nameservers(domain, nameservers)
-            result['namecheap_ns_updated'] = namecheap_ns_success
-            result['steps']['nameserver_update'] = {
-                'status': 'completed',
-                'namecheap_updated': namecheap_ns_success
-            }
-            
-            if namecheap_ns_success:
-                if progress_callback:
-                    progress_callback('Nameservers updated automatically in Namecheap', 'nameserver_update', 'completed')
-                print("Nameservers updated successfully")
-            else:
-                if progress_callback:
-                    progress_callback('Manual nameserver update required in Namecheap', 'nameserver_update', 'completed')
-                print("Failed to update nameservers automatically")
-            
-            result['status'] = 'completed'
-            
-            print(f"\n✅ Domain setup completed for {domain}!")
-            print(f"🌐 Your domain will be accessible via CloudFront CDN")
-            print(f"🔒 SSL certificate automatically handles HTTPS")
-            print(f"⚡ Global edge locations provide fast performance")
-            print(f"📍 No IP addresses to manage - all handled by AWS!")
-            
-            return result
-            
+            if step_key == 'certificate':
+                status = self.certificate_status(checkpoint['certificate_arn'])
+                if status == 'PENDING_VALIDATION' and checkpoint.get('validation_records'):
+                    # A pending certificate only validates once its CNAMEs were written where this
+                    # run's DNS will answer: in Route 53 for route53 mode, in Namecheap otherwise
+                    if (validation_mode or Config.CERT_VALIDATION_MODE) == 'route53':
+                        return bool(checkpoint.get('validation_change_id'))
+                    return bool(checkpoint.get('namecheap_cname_updated'))
+                return status in ('ISSUED', 'PENDING_VALIDATION')
+            if step_key == 'certificate_validation':
+                cert_arn = outputs['certificate']['certificate_arn']
+                cert = self.acm_client.describe_certificate(CertificateArn=cert_arn)['Certificate']
+                return cert['Status'] == 'ISSUED'
+            if step_key == 'route53_zone':
+                self.route53_client.get_hosted_zone(Id=checkpoint['zone_id'])
+                return True
+            if step_key == 's3_buckets':
+                self.s3_client.head_bucket(Bucket=domain)
+                self.s3_client.head_bucket(Bucket=f'www.{domain}')
+                return True
+            if step_key == 'cloudfront':
+                distribution = self.cloudfront_client.get_distribution(Id=checkpoint['distribution_id'])['Distribution']
+                return domain in distribution['DistributionConfig'].get('Aliases', {}).get('Items', [])
+            if step_key == 'nameserver_update':
+                # Only a successful automatic update is worth skipping
+                return bool(checkpoint.get('namecheap_updated'))
         except Exception as e:
-            result['status'] = 'failed'
-            result['error'] = str(e)
-            return result
+            print(f"Checkpoint verification for {domain}/{step_key} failed: {e}")
+            return False
+
+        # route53_records is idempotent and costs one listing: always re-run it
+        return False
 
     def check_existing_certificate(self, domain: str) -> str:
         """
         Check if a valid certificate already exists for the domain
         """
         try:
-            paginator = self.acm_client.get_paginator('list_certificates')
-            
-            for page in paginator.paginate(CertificateStatuses=['ISSUED']):
-                for cert in page['CertificateSummaryList']:
-                    cert_arn = cert['CertificateArn']
-                    cert_details = self.acm_client.describe_certificate(CertificateArn=cert_arn)
-                    
-                    # Check if the certificate covers this domain
-                    cert_domains = [cert_details['Certificate']['DomainName']]
-                    cert_domains.extend(cert_details['Certificate'].get('SubjectAlternativeNames', []))
-                    
-                    # Check if certificate covers both domain and *.domain
-                    if domain in cert_domains and f'*.{domain}' in cert_domains:
-                        # Check if certificate is valid and not expired
-                        if cert_details['Certificate']['Status'] == 'ISSUED':
-                            print(f"Found existing certificate for {domain}: {cert_arn}")
-                            return cert_arn
+            cert_arns = self.inventory.covering_certificates(self.account_key, domain) if self.inventory else None
+            # Only an inventory hit is trusted: a certificate issued since the last sync is in the index
+            cert_arn = cert_arns[0] if cert_arns else self.certificate_index.find(domain)
+            if cert_arn:
+                print(f"Found existing certificate for {domain}: {cert_arn}")
+                return cert_arn
         except Exception as e:
             print(f"Error checking existing certificates: {e}")
         
@@ -562,13 +762,33 @@ class AWSAutomation:
             return existing_cert, []
         
         # Request new certificate if none exists
-        print(f"Requesting new SSL certificate for {domain}")
+        certificate_arn = self.start_certificate_request(domain)
+        
+        # Wait for validation records to be generated
+        waiter = AdaptiveWaiter(initial_delay=1, max_delay=5, timeout=Config.CERT_RECORDS_TIMEOUT)
+        try:
+            validation_records = waiter.wait(
+                lambda: self.certificate_validation_records(certificate_arn),
+                description='validation records',
+                on_attempt=lambda attempt, elapsed: print(f"Attempt {attempt}: validation records not ready yet ({elapsed:.0f}s)")
+            )
+        except WaiterTimeout:
+            raise Exception("Failed to get validation records from AWS")
+        
+        print(f"Total validation records found: {len(validation_records)}")
+        return certificate_arn, validation_records
+
+    def start_certificate_request(self, domain: str, additional_domains: List[str] = ()) -> str:
+        """
+        Request a DNS-validated certificate for the domain and its wildcard (plus
+        any additional domains and their wildcards); returns the ARN
+        """
+        print(f"Requesting new SSL certificate for {', '.join([domain, *additional_domains])}")
         response = self.acm_client.request_certificate(
             DomainName=domain,
             ValidationMethod='DNS',
             SubjectAlternativeNames=[
-                domain,
-                f'*.{domain}'
+                name for covered in [domain, *additional_domains] for name in (covered, f'*.{covered}')
             ],
             Options={
                 'CertificateTransparencyLoggingPreference': 'ENABLED'
@@ -577,56 +797,213 @@ class AWSAutomation:
         
         certificate_arn = response['CertificateArn']
         print(f"Certificate ARN: {certificate_arn}")
+        return certificate_arn
+
+    def certificate_status(self, certificate_arn: str) -> Optional[str]:
+        """ACM status of a certificate, or None if it no longer exists"""
+        try:
+            return self.acm_client.describe_certificate(CertificateArn=certificate_arn)['Certificate']['Status']
+        except self.acm_client.exceptions.ResourceNotFoundException:
+            return None
+
+    def certificate_validation_records(self, certificate_arn: str) -> List[Dict]:
+        """The certificate's validation CNAMEs; empty until ACM has generated them for every name"""
+        cert_details = self.acm_client.describe_certificate(
+            CertificateArn=certificate_arn
+        )
         
-        # Wait for validation records to be generated
-        validation_records = []
-        max_attempts = 10
-        attempt = 0
-        
-        while attempt < max_attempts and not validation_records:
-            attempt += 1
-            print(f"Attempt {attempt}: Getting validation records...")
-            time.sleep(3)
-            
-            cert_details = self.acm_client.describe_certificate(
-                CertificateArn=certificate_arn
+        validations = cert_details['Certificate']['DomainValidationOptions']
+        if not all('ResourceRecord' in validation for validation in validations):
+            return []
+        records = []
+        for validation in validations:
+            if 'ResourceRecord' in validation:
+                record = validation['ResourceRecord']
+                records.append({
+                    'name': record['Name'],
+                    'value': record['Value'],
+                    'type': record['Type']
+                })
+                print(f"Found validation record: {record['Name']} -> {record['Value']}")
+        return records
+
+    def request_packed_certificate(self, pack: CertificatePack,
+                                   route53_zone_ids: Dict[str, str] = None) -> Dict[str, Dict]:
+        """
+        Request one certificate for every domain of the pack not already covered
+        by an ISSUED certificate and write all its validation CNAMEs in one pass:
+        to Namecheap, or to the members' hosted zones when `route53_zone_ids` is given.
+
+        Returns domain -> {'certificate_arn', 'validation_records'} plus
+        'namecheap_cname_updated' or the Route 53 'validation_change_id'.
+        """
+        packed = {}
+        for domain in pack.domains:
+            existing_cert = self.check_existing_certificate(domain)
+            if existing_cert:
+                packed[domain] = {'certificate_arn': existing_cert, 'validation_records': []}
+        new_domains = [domain for domain in pack.domains if domain not in packed]
+        if not new_domains:
+            return packed
+
+        certificate_arn = self.start_certificate_request(new_domains[0], new_domains[1:])
+        waiter = AdaptiveWaiter(initial_delay=1, max_delay=5, timeout=Config.CERT_RECORDS_TIMEOUT)
+        try:
+            validation_records = waiter.wait(
+                lambda: self.certificate_validation_records(certificate_arn),
+                description='validation records',
+                on_attempt=lambda attempt, elapsed: print(f"Attempt {attempt}: validation records not ready yet ({elapsed:.0f}s)")
             )
-            
-            for validation in cert_details['Certificate']['DomainValidationOptions']:
-                if 'ResourceRecord' in validation:
-                    record = validation['ResourceRecord']
-                    validation_records.append({
-                        'name': record['Name'],
-                        'value': record['Value'],
-                        'type': record['Type']
-                    })
-                    print(f"Found validation record: {record['Name']} -> {record['Value']}")
-        
-        if not validation_records:
+        except WaiterTimeout:
             raise Exception("Failed to get validation records from AWS")
-        
-        print(f"Total validation records found: {len(validation_records)}")
-        return certificate_arn, validation_records
+
+        print(f"Shared certificate {certificate_arn} covers {len(new_domains)} domain(s)")
+        for domain, records in validation_records_by_domain(validation_records, new_domains).items():
+            packed[domain] = {'certificate_arn': certificate_arn, 'validation_records': records}
+            if route53_zone_ids is None:
+                packed[domain]['namecheap_cname_updated'] = self.add_namecheap_cname_records(domain, records)
+            elif domain in route53_zone_ids:
+                packed[domain]['validation_change_id'] = self.upsert_validation_records(
+                    route53_zone_ids[domain], domain, records
+                )
+        return packed
+
+    def list_hosted_zones(self) -> Dict[str, Dict]:
+        """Domain -> {'zone_id', 'name'} for every hosted zone, from one paginated listing"""
+        zones = {}
+        paginator = self.route53_client.get_paginator('list_hosted_zones')
+        for page in paginator.paginate():
+            for zone in page['HostedZones']:
+                # Keep the first zone per name, like list_hosted_zones_by_name lookups did
+                zones.setdefault(zone['Name'].rstrip('.'), {
+                    'zone_id': zone['Id'].split('/')[-1],
+                    'name': zone['Name']
+                })
+        return zones
+
+    def find_hosted_zone(self, domain: str) -> Optional[Dict]:
+        """{'zone_id', 'name'} of the domain's hosted zone from one list_hosted_zones_by_name call, or None"""
+        response = self.route53_client.list_hosted_zones_by_name(DNSName=domain, MaxItems='1')
+        for zone in response.get('HostedZones', []):
+            if zone['Name'].rstrip('.') == domain:
+                return {'zone_id': zone['Id'].split('/')[-1], 'name': zone['Name']}
+        return None
+
+    def _lookup_hosted_zones(self, domains: List[str]) -> Dict[str, Dict]:
+        """One targeted lookup for a single domain; one full listing for a batch"""
+        if len(domains) == 1:
+            zone = self.find_hosted_zone(domains[0])
+            return {domains[0]: zone} if zone else {}
+        return self.list_hosted_zones()
+
+    def bucket_exists(self, bucket: str) -> bool:
+        try:
+            self.s3_client.head_bucket(Bucket=bucket)
+            return True
+        except Exception:
+            return False
+
+    def check_existing_resources(self, domains: List[str], max_workers: int = None) -> Dict[str, Dict]:
+        """
+        Report existing CloudFront, Route 53 and S3 resources for many domains.
+
+        Hosted zones and distributions are listed once for the whole batch (a
+        single domain uses a targeted hosted zone lookup instead); the
+        per-domain head_bucket calls run concurrently with bounded parallelism.
+        """
+        max_workers = max_workers or Config.CHECK_EXISTING_MAX_WORKERS
+        buckets = [bucket for domain in domains for bucket in (domain, f'www.{domain}')]
+
+        # Inventory hits answer without AWS calls; misses may be resources created
+        # since the last sync (by another worker or outside the app), so they are checked live
+        zones = self._inventory_zones(domains) or {}
+        zone_misses = [domain for domain in domains if domain not in zones]
+        stored_buckets = self._inventory_lookup('bucket', buckets) or {}
+        stored_distributions = self._inventory_lookup(
+            'distribution', [name for domain in domains for name in (domain, f'www.{domain}')]
+        ) or {}
+        distribution_misses = [domain for domain in domains
+                               if domain not in stored_distributions and f'www.{domain}' not in stored_distributions]
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(buckets) + 2))) as executor:
+            zones_future = executor.submit(self._lookup_hosted_zones, zone_misses) if zone_misses else None
+            # Warm the alias index so the per-domain lookups below are dictionary hits
+            distributions_future = executor.submit(
+                self.distribution_index.refresh, self.distribution_index.miss_refresh_interval
+            ) if distribution_misses else None
+            bucket_futures = {bucket: executor.submit(self.bucket_exists, bucket)
+                              for bucket in buckets if bucket not in stored_buckets}
+            bucket_exists = lambda bucket: bucket in stored_buckets or bucket_futures[bucket].result()
+
+            if zones_future is not None:
+                try:
+                    zones.update(zones_future.result())
+                except Exception as e:
+                    print(f"Error listing hosted zones: {e}")
+            if distributions_future is not None:
+                try:
+                    distributions_future.result()
+                except Exception as e:
+                    print(f"Error listing distributions: {e}")
+
+            results = {}
+            for domain in domains:
+                zone = zones.get(domain)
+                results[domain] = {
+                    'cloudfront': self.check_existing_cloudfront_distribution(domain),
+                    'route53': dict(zone, exists=True) if zone else {'exists': False},
+                    's3_main': {'exists': bucket_exists(domain)},
+                    's3_www': {'exists': bucket_exists(f'www.{domain}')}
+                }
+        return results
+
+    def _inventory_lookup(self, kind: str, names: List[str]) -> Optional[Dict[str, List[Tuple[str, Dict]]]]:
+        """Inventory matches for `names`, or None when there is no fresh inventory to trust"""
+        if self.inventory is None:
+            return None
+        try:
+            return self.inventory.lookup(self.account_key, kind, names)
+        except Exception as e:
+            print(f"Error reading the resource inventory: {e}")
+            return None
+
+    def _inventory_zones(self, domains: List[str]) -> Optional[Dict[str, Dict]]:
+        """Domain -> {'zone_id', 'name'} from the inventory, preferring public zones"""
+        found = self._inventory_lookup('hosted_zone', domains)
+        if found is None:
+            return None
+        zones = {}
+        for domain, matches in found.items():
+            zone_id, data = sorted(matches, key=lambda match: match[1].get('private', False))[0]
+            zones[domain] = {'zone_id': zone_id, 'name': data['name']}
+        return zones
 
     def create_hosted_zone(self, domain: str) -> Tuple[str, List[str], bool]:
         """
         Create Route 53 hosted zone or use existing one
         """
-        # Check if zone already exists
+        # The inventory knows zones from every account sync and write-through
+        zone = (self._inventory_zones([domain]) or {}).get(domain)
+        if zone:
+            print(f"Using existing Route 53 hosted zone: {zone['zone_id']}")
+            try:
+                zone_details = self.route53_client.get_hosted_zone(Id=zone['zone_id'])
+                return zone['zone_id'], zone_details['DelegationSet']['NameServers'], True
+            except self.route53_client.exceptions.NoSuchHostedZone:
+                print(f"Hosted zone {zone['zone_id']} no longer exists, checking Route 53")
+        
+        # Check if zone already exists (one bounded call, kept as the guard against duplicate zones)
         try:
-            response = self.route53_client.list_hosted_zones_by_name(DNSName=domain)
-            zones = response.get('HostedZones', [])
-            
-            for zone in zones:
-                if zone['Name'].rstrip('.') == domain:
-                    zone_id = zone['Id'].split('/')[-1]
-                    print(f"Using existing Route 53 hosted zone: {zone_id}")
-                    
-                    # Get the zone details to extract nameservers
-                    zone_details = self.route53_client.get_hosted_zone(Id=zone_id)
-                    nameservers = zone_details['DelegationSet']['NameServers']
-                    
-                    return zone_id, nameservers, True
+            zone = self.find_hosted_zone(domain)
+            if zone:
+                zone_id = zone['zone_id']
+                print(f"Using existing Route 53 hosted zone: {zone_id}")
+                
+                # Get the zone details to extract nameservers
+                zone_details = self.route53_client.get_hosted_zone(Id=zone_id)
+                nameservers = zone_details['DelegationSet']['NameServers']
+                
+                return zone_id, nameservers, True
         except Exception as e:
             print(f"Error checking existing zones: {e}")
         
@@ -639,46 +1016,30 @@ class AWSAutomation:
         
         zone_id = response['HostedZone']['Id'].split('/')[-1]
         nameservers = [ns for ns in response['DelegationSet']['NameServers']]
+        if self.inventory:
+            self.inventory.record(self.account_key, 'hosted_zone', [domain], zone_id,
+                                  {'name': response['HostedZone']['Name'], 'private': False})
         
         return zone_id, nameservers, False
 
-    def setup_s3_buckets(self, domain: str) -> str:
-        """
-        Create and configure S3 buckets for static website hosting
-        """
+    def _create_bucket(self, bucket: str):
         try:
-            # Create main domain bucket
             if self.aws_region == 'us-east-1':
-                self.s3_client.create_bucket(Bucket=domain)
+                self.s3_client.create_bucket(Bucket=bucket)
             else:
                 self.s3_client.create_bucket(
-                    Bucket=domain,
+                    Bucket=bucket,
                     CreateBucketConfiguration={
                         'LocationConstraint': self.aws_region
                     }
                 )
         except self.s3_client.exceptions.BucketAlreadyExists:
-            print(f"Bucket {domain} already exists, continuing...")
+            print(f"Bucket {bucket} already exists, continuing...")
         except self.s3_client.exceptions.BucketAlreadyOwnedByYou:
-            print(f"Bucket {domain} already owned by you, continuing...")
-        
-        # Create www subdomain bucket
-        www_bucket = f'www.{domain}'
-        try:
-            if self.aws_region == 'us-east-1':
-                self.s3_client.create_bucket(Bucket=www_bucket)
-            else:
-                self.s3_client.create_bucket(
-                    Bucket=www_bucket,
-                    CreateBucketConfiguration={
-                        'LocationConstraint': self.aws_region
-                    }
-                )
-        except self.s3_client.exceptions.BucketAlreadyExists:
-            print(f"Bucket {www_bucket} already exists, continuing...")
-        except self.s3_client.exceptions.BucketAlreadyOwnedByYou:
-            print(f"Bucket {www_bucket} already owned by you, continuing...")
-        
+            print(f"Bucket {bucket} already owned by you, continuing...")
+
+    def _configure_main_website(self, domain: str):
+        """Serve the main bucket as a website with a blank index.html"""
         # Configure main bucket for static website hosting
         self.s3_client.put_bucket_website(
             Bucket=domain,
@@ -700,21 +1061,16 @@ class AWSAutomation:
             print(f"Successfully added blank index.html to {domain} bucket")
         except Exception as e:
             print(f"Error adding index.html to bucket: {str(e)}")
-        
-        # Configure www bucket to redirect to main domain
-        self.s3_client.put_bucket_website(
-            Bucket=www_bucket,
-            WebsiteConfiguration={
-                'RedirectAllRequestsTo': {
-                    'HostName': domain,
-                    'Protocol': 'https'
-                }
-            }
-        )
-        
+
+    def _make_bucket_public(self, domain: str):
+        """Allow public reads of the main bucket"""
+        self._disable_public_access_block(domain)
+        self.put_public_bucket_policy(domain, self._public_read_policy(domain))
+
+    def _disable_public_access_block(self, bucket: str):
         # IMPORTANT: First disable block public access settings
         self.s3_client.put_public_access_block(
-            Bucket=domain,
+            Bucket=bucket,
             PublicAccessBlockConfiguration={
                 'BlockPublicAcls': False,
                 'IgnorePublicAcls': False,
@@ -722,11 +1078,9 @@ class AWSAutomation:
                 'RestrictPublicBuckets': False
             }
         )
-        
-        # Wait a moment for the settings to propagate
-        time.sleep(2)
-        
-        # Then set bucket policy for main domain
+
+    @staticmethod
+    def _public_read_policy(domain: str) -> str:
         policy_dict = {
             "Version": "2012-10-17",
             "Statement": [
@@ -742,11 +1096,54 @@ class AWSAutomation:
                 }
             ]
         }
-        policy = json.dumps(policy_dict)
-        self.s3_client.put_bucket_policy(
-            Bucket=domain,
-            Policy=policy
+        return json.dumps(policy_dict)
+
+    def _configure_www_redirect(self, domain: str):
+        """Redirect the www bucket to the main domain"""
+        www_bucket = f'www.{domain}'
+        
+        # Configure www bucket to redirect to main domain
+        self.s3_client.put_bucket_website(
+            Bucket=www_bucket,
+            WebsiteConfiguration={
+                'RedirectAllRequestsTo': {
+                    'HostName': domain,
+                    'Protocol': 'https'
+                }
+            }
         )
+
+    def setup_s3_buckets(self, domain: str) -> str:
+        """
+        Create and configure S3 buckets for static website hosting
+
+        Both buckets are created concurrently; then the main bucket's website
+        configuration, its public-access chain (access block, then policy) and
+        the www redirect run concurrently. The policy is put as soon as S3
+        accepts it (see put_public_bucket_policy).
+        """
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            def submit(func, *args):
+                # Each call runs in a copy of this context so its API calls stay attributed to the task
+                return executor.submit(contextvars.copy_context().run, func, *args)
+
+            for future in [submit(self._create_bucket, domain), submit(self._create_bucket, f'www.{domain}')]:
+                future.result()
+            chains = [
+                submit(self._make_bucket_public, domain),
+                submit(self._configure_main_website, domain),
+                submit(self._configure_www_redirect, domain),
+            ]
+            for future in chains:
+                future.result()
+        
+        return self._buckets_ready(domain)
+
+    def _buckets_ready(self, domain: str) -> str:
+        """Record both configured buckets in the inventory and return the website endpoint"""
+        if self.inventory:
+            for bucket in (domain, f'www.{domain}'):
+                self.inventory.record(self.account_key, 'bucket', [bucket], bucket)
         
         # Get the website endpoint
         if self.aws_region == 'us-east-1':
@@ -762,20 +1159,13 @@ class AWSAutomation:
             return False
         
         try:
-            success_count = 0
             for record in validation_records:
-                host_name = record['name']
-                host_value = record['value']
-                print(f"Adding CNAME record to Namecheap: {host_name} -> {host_value}")
-                
-                try:
-                    self.namecheap_manager.add_cname_record(domain, host_name, host_value)
-                    print(f"Successfully added CNAME record for {host_name}")
-                    success_count += 1
-                except Exception as e:
-                    print(f"Error adding CNAME record {host_name}: {e}")
+                print(f"Adding CNAME record to Namecheap: {record['name']} -> {record['value']}")
             
-            return success_count == len(validation_records)
+            # One getHosts/setHosts round trip for all validation records
+            self.namecheap_manager.upsert_cname_records(domain, validation_records)
+            print(f"Successfully added {len(validation_records)} CNAME record(s) for {domain}")
+            return True
         except Exception as e:
             print(f"Error adding CNAME records to Namecheap: {e}")
             return False
@@ -804,9 +1194,49 @@ class AWSAutomation:
             traceback.print_exc()
             return False
 
-    def wait_for_certificate_validation(self, certificate_arn: str, timeout: int = 600):
+    def put_public_bucket_policy(self, bucket: str, policy: str):
+        """
+        Set a public bucket policy as soon as the public access block change has
+        propagated (S3 answers AccessDenied until then); the last error is
+        raised once S3_POLICY_TIMEOUT passes
+        """
+        last_error = []
+
+        def try_put_policy():
+            error = self.try_put_bucket_policy(bucket, policy)
+            last_error[:] = [error] if error else []
+            return error is None
+
+        waiter = AdaptiveWaiter(initial_delay=0.5, max_delay=4, timeout=Config.S3_POLICY_TIMEOUT)
+        try:
+            waiter.wait(try_put_policy, description=f'public access settings on {bucket}')
+        except WaiterTimeout:
+            raise last_error[0]
+
+    def try_put_bucket_policy(self, bucket: str, policy: str) -> Optional[ClientError]:
+        """
+        Put the policy once; returns the error if S3 rejects it as blocked
+        (AccessDenied, or a BlockPublicPolicy error), which is retried within
+        S3_POLICY_TIMEOUT: enforcement of the access block change lags behind
+        its configuration. Other errors are raised.
+        """
+        try:
+            self.s3_client.put_bucket_policy(Bucket=bucket, Policy=policy)
+            return None
+        except ClientError as e:
+            error = e.response.get('Error', {})
+            if error.get('Code') != 'AccessDenied' and 'BlockPublicPolicy' not in error.get('Message', ''):
+                raise
+            return e
+
+    def wait_for_certificate_validation(self, certificate_arn: str, timeout: int = 600, validation_records: List[Dict] = None):
         """
         Wait for certificate to be validated
+
+        When validation records and a DNS resolver are available, ACM is only
+        polled once the CNAMEs are publicly visible. The certificate is then
+        handed to the account's ResourceWatcher, which checks all pending
+        certificates with one listing.
         """
         # First check if it's already validated
         cert_details = self.acm_client.describe_certificate(
@@ -817,51 +1247,47 @@ class AWSAutomation:
             print(f"Certificate {certificate_arn} is already validated")
             return
         
-        # Wait for validation if not already validated
         start_time = time.time()
-        while time.time() - start_time < timeout:
-            cert_details = self.acm_client.describe_certificate(
-                CertificateArn=certificate_arn
-            )
-            
-            status = cert_details['Certificate']['Status']
-            print(f"Certificate status: {status}")
-            
-            if status == 'ISSUED':
-                print("Certificate successfully validated!")
-                return
-            elif status == 'FAILED':
-                raise Exception("Certificate validation failed")
-            
-            # Check validation status for each domain
-            for validation in cert_details['Certificate']['DomainValidationOptions']:
-                val_status = validation.get('ValidationStatus', 'PENDING')
-                val_domain = validation.get('DomainName', '')
-                print(f"  Domain: {val_domain}, Status: {val_status}")
-            
-            time.sleep(30)  # Check every 30 seconds
-        
-        raise TimeoutError(f"Certificate validation timed out after {timeout} seconds")
+
+        if validation_records and self.dns_resolver is not None:
+            dns_waiter = AdaptiveWaiter(initial_delay=2, max_delay=15, timeout=min(Config.DNS_PROPAGATION_TIMEOUT, timeout))
+            try:
+                dns_waiter.wait(
+                    lambda: cname_records_visible(self.dns_resolver, validation_records),
+                    description='validation CNAME records in DNS'
+                )
+                print(f"Validation CNAME records are visible in DNS after {time.time() - start_time:.0f}s")
+            except WaiterTimeout:
+                print("Validation CNAME records not visible yet, polling ACM anyway")
+
+        # The account's resource watcher polls every pending certificate at once
+        remaining = max(timeout - (time.time() - start_time), 0)
+        try:
+            certificate = self.resource_watcher.wait('certificate', certificate_arn, timeout=remaining)
+        except TimeoutError:
+            raise TimeoutError(f"Certificate validation timed out after {timeout} seconds")
+        self.certificate_validated(certificate_arn, certificate)
+
+    def certificate_validated(self, certificate_arn: str, certificate: Dict):
+        """Index a certificate that just became ISSUED"""
+        print(f"Certificate {certificate_arn} successfully validated!")
+        names = [certificate['DomainName'], *certificate.get('SubjectAlternativeNames', [])]
+        self.certificate_index.add(certificate_arn, names)
+        if self.inventory:
+            self.inventory.record(self.account_key, 'certificate', set(names), certificate_arn)
 
     def check_existing_cloudfront_distribution(self, domain: str) -> Dict:
         """
         Check if a CloudFront distribution already exists for this domain
         """
         try:
-            paginator = self.cloudfront_client.get_paginator('list_distributions')
-            
-            for page in paginator.paginate():
-                if 'Items' in page['DistributionList']:
-                    for distribution in page['DistributionList']['Items']:
-                        if 'Aliases' in distribution and 'Items' in distribution['Aliases']:
-                            if domain in distribution['Aliases']['Items'] or f'www.{domain}' in distribution['Aliases']['Items']:
-                                return {
-                                    'exists': True,
-                                    'distribution_id': distribution['Id'],
-                                    'domain_name': distribution['DomainName'],
-                                    'status': distribution['Status'],
-                                    'enabled': distribution['Enabled']
-                                }
+            found = self._inventory_lookup('distribution', [domain, f'www.{domain}']) or {}
+            matches = found.get(domain) or found.get(f'www.{domain}')
+            # Only an inventory hit is trusted: a miss is checked against the live alias index
+            existing = dict(matches[0][1]) if matches else self.distribution_index.find(domain)
+            if existing:
+                existing['exists'] = True
+                return existing
             
             return {'exists': False}
         except Exception as e:
@@ -887,6 +1313,13 @@ class AWSAutomation:
         if cert_status != 'ISSUED':
             raise Exception(f"Certificate is not yet validated. Current status: {cert_status}")
         
+        # Attach to a shared, already deployed distribution when a pool is configured
+        if self.cloudfront_pool:
+            pooled = self.attach_to_distribution_pool(domain, s3_endpoint, certificate_arn)
+            if pooled:
+                return pooled[0], pooled[1], False
+            print(f"No pooled CloudFront distribution can take {domain}, creating a dedicated one")
+        
         # Only create new distribution if none exists
         print(f"Creating new CloudFront distribution for {domain}")
         print(f"Using certificate: {certificate_arn}")
@@ -902,22 +1335,12 @@ class AWSAutomation:
                     'DefaultRootObject': 'index.html',
                     'Origins': {
                         'Quantity': 1,
-                        'Items': [
-                            {
-                                'Id': f'S3-{domain}',
-                                'DomainName': s3_endpoint,
-                                'CustomOriginConfig': {
-                                    'HTTPPort': 80,
-                                    'HTTPSPort': 443,
-                                    'OriginProtocolPolicy': 'http-only'
-                                }
-                            }
-                        ]
+                        'Items': [self._s3_origin(domain, s3_endpoint)]
                     },
                     'DefaultCacheBehavior': {
                         'TargetOriginId': f'S3-{domain}',
                         'ViewerProtocolPolicy': 'redirect-to-https',
-                        'CachePolicyId': '4135ea2d-6df8-44a3-9df3-4b5a84be39ad',  # CachingDisabled policy ID
+                        'CachePolicyId': self.CACHING_DISABLED_POLICY_ID,
                         'OriginRequestPolicyId': '88a5eaf4-2fd4-4709-b370-b4c650ea3fcf',  # CORS-S3Origin policy ID
                         'Compress': True,
                         'AllowedMethods': {
@@ -937,6 +1360,10 @@ class AWSAutomation:
             
             distribution_id = response['Distribution']['Id']
             distribution_domain = response['Distribution']['DomainName']
+            self.distribution_index.record(response['Distribution'])
+            if self.inventory:
+                self.inventory.record(self.account_key, 'distribution', [domain, f'www.{domain}'], distribution_id,
+                                      DistributionAliasIndex._summary(response['Distribution']))
             
             return distribution_id, distribution_domain, False
             
@@ -944,6 +1371,190 @@ class AWSAutomation:
             # More detailed error message
             raise Exception(f"Certificate validation error: {str(e)}. The certificate might not be fully validated yet or not in the correct region (us-east-1).")
 
+    def upsert_validation_records(self, zone_id: str, domain: str, validation_records: List[Dict]) -> str:
+        """
+        Write the certificate's validation CNAMEs and the track CNAME to the
+        hosted zone in one change batch; returns the change id
+        """
+        changes = []
+        for record in {record['name']: record for record in validation_records}.values():
+            changes.append({
+                'Action': 'UPSERT',
+                'ResourceRecordSet': {
+                    'Name': record['name'],
+                    'Type': record.get('type', 'CNAME'),
+                    'TTL': 60,
+                    'ResourceRecords': [{'Value': record['value']}]
+                }
+            })
+        changes.append({
+            'Action': 'UPSERT',
+            'ResourceRecordSet': {
+                'Name': f'track.{domain}',
+                'Type': 'CNAME',
+                'TTL': 60,
+                'ResourceRecords': [{'Value': 'bseav.ttrk.io'}]
+            }
+        })
+        print(f"Writing {len(changes) - 1} validation record(s) and the track record for {domain} to Route 53")
+        response = self.route53_client.change_resource_record_sets(
+            HostedZoneId=zone_id,
+            ChangeBatch={'Comment': f'ACM validation for {domain}', 'Changes': changes}
+        )
+        return response['ChangeInfo']['Id']
+
+    CACHING_DISABLED_POLICY_ID = '4135ea2d-6df8-44a3-9df3-4b5a84be39ad'  # managed CachingDisabled policy
+
+    @staticmethod
+    def _s3_origin(domain: str, s3_endpoint: str) -> Dict:
+        return {
+            'Id': f'S3-{domain}',
+            'DomainName': s3_endpoint,
+            'CustomOriginConfig': {
+                'HTTPPort': 80,
+                'HTTPSPort': 443,
+                'OriginProtocolPolicy': 'http-only'
+            }
+        }
+
+    # Viewer-request function of pooled distributions: route each Host to its S3-<domain> origin
+    POOL_ROUTER_CODE = """import cf from 'cloudfront';
+
+function handler(event) {
+    var host = event.request.headers.host.value.toLowerCase();
+    var domain = host.indexOf('www.') === 0 ? host.substring(4) : host;
+    cf.selectRequestOriginById('S3-' + domain);
+    return event.request;
+}
+"""
+
+    def pool_router_function_arn(self) -> str:
+        """ARN of the published origin router function, created on first use (caller holds _pool_lock)"""
+        if self._pool_router_arn:
+            return self._pool_router_arn
+        name = Config.CLOUDFRONT_POOL_FUNCTION
+        try:
+            summary = self.cloudfront_client.describe_function(Name=name, Stage='LIVE')['FunctionSummary']
+        except self.cloudfront_client.exceptions.NoSuchFunctionExists:
+            try:
+                print(f"Creating CloudFront function {name} for pooled distributions")
+                etag = self.cloudfront_client.create_function(
+                    Name=name,
+                    FunctionConfig={'Comment': 'Route pooled domains to their S3 origin', 'Runtime': 'cloudfront-js-2.0'},
+                    FunctionCode=self.POOL_ROUTER_CODE.encode()
+                )['ETag']
+            except self.cloudfront_client.exceptions.FunctionAlreadyExists:
+                # Created, but never published, by another worker process
+                etag = self.cloudfront_client.describe_function(Name=name, Stage='DEVELOPMENT')['ETag']
+            summary = self.cloudfront_client.publish_function(Name=name, IfMatch=etag)['FunctionSummary']
+        self._pool_router_arn = summary['FunctionMetadata']['FunctionARN']
+        return self._pool_router_arn
+
+    def attach_to_distribution_pool(self, domain: str, s3_endpoint: str, certificate_arn: str) -> Optional[Tuple[str, str]]:
+        """
+        Add the domain (and www.) as aliases of a pooled distribution, with its
+        bucket as an extra origin picked by the router function.
+
+        A distribution has a single viewer certificate, so a member is only
+        eligible when this certificate covers every alias it already serves,
+        e.g. the domain's certificate pack; the member then takes it. Pooled
+        domains share the cache, so a member must not cache at all: an empty
+        member gets the CachingDisabled policy, a serving member with any other
+        policy is skipped. Returns (distribution id, CloudFront domain), or
+        None when no member can take the domain.
+        """
+        with self._pool_lock:
+            router_arn = self.pool_router_function_arn()
+            certificate = self.acm_client.describe_certificate(CertificateArn=certificate_arn)['Certificate']
+            certificate_names = {certificate['DomainName'], *certificate.get('SubjectAlternativeNames', [])}
+            for distribution_id in self.cloudfront_pool:
+                for attempt in range(3):
+                    try:
+                        response = self.cloudfront_client.get_distribution_config(Id=distribution_id)
+                    except self.cloudfront_client.exceptions.NoSuchDistribution:
+                        print(f"Pooled CloudFront distribution {distribution_id} does not exist, skipping")
+                        break
+                    config = response['DistributionConfig']
+                    aliases = config.get('Aliases', {}).get('Items', [])
+                    origins = config['Origins']['Items']
+                    member_cert = config.get('ViewerCertificate', {}).get('ACMCertificateArn')
+                    associations = config['DefaultCacheBehavior'].get('FunctionAssociations', {}).get('Items', [])
+                    viewer_request = [a['FunctionARN'] for a in associations if a['EventType'] == 'viewer-request']
+
+                    uncovered = [alias for alias in aliases if alias not in certificate_names
+                                 and f"*.{alias.split('.', 1)[-1]}" not in certificate_names]
+                    if uncovered:
+                        print(f"Certificate of {domain} does not cover {', '.join(uncovered)} "
+                              f"on pooled distribution {distribution_id}, skipping")
+                        break
+                    cache_behavior = config['DefaultCacheBehavior']
+                    if aliases and cache_behavior.get('CachePolicyId') != self.CACHING_DISABLED_POLICY_ID:
+                        print(f"Pooled distribution {distribution_id} does not use the CachingDisabled policy, skipping")
+                        break
+                    if len(aliases) + 2 > Config.CLOUDFRONT_POOL_MAX_ALIASES or len(origins) + 1 > Config.CLOUDFRONT_POOL_MAX_ORIGINS:
+                        break
+                    if viewer_request and viewer_request != [router_arn]:
+                        print(f"Pooled distribution {distribution_id} has another viewer-request function, skipping")
+                        break
+
+                    new_aliases = [alias for alias in (domain, f'www.{domain}') if alias not in aliases]
+                    config['Aliases'] = {'Quantity': len(aliases) + len(new_aliases), 'Items': aliases + new_aliases}
+                    origins = [origin for origin in origins if origin['Id'] != f'S3-{domain}']
+                    origins.append(self._s3_origin(domain, s3_endpoint))
+                    config['Origins'] = {'Quantity': len(origins), 'Items': origins}
+                    if not viewer_request:
+                        associations = associations + [{'FunctionARN': router_arn, 'EventType': 'viewer-request'}]
+                        config['DefaultCacheBehavior']['FunctionAssociations'] = {
+                            'Quantity': len(associations), 'Items': associations
+                        }
+                    if not aliases:
+                        # Cached responses are keyed without the Host header: never cache on a shared distribution
+                        for legacy in ('ForwardedValues', 'MinTTL', 'DefaultTTL', 'MaxTTL'):
+                            cache_behavior.pop(legacy, None)
+                        cache_behavior['CachePolicyId'] = self.CACHING_DISABLED_POLICY_ID
+                    if member_cert != certificate_arn:
+                        config['ViewerCertificate'] = {
+                            'ACMCertificateArn': certificate_arn,
+                            'SSLSupportMethod': 'sni-only',
+                            'MinimumProtocolVersion': 'TLSv1.2_2021'
+                        }
+
+                    try:
+                        updated = self.cloudfront_client.update_distribution(
+                            Id=distribution_id, IfMatch=response['ETag'], DistributionConfig=config
+                        )['Distribution']
+                    except self.cloudfront_client.exceptions.PreconditionFailed:
+                        # Another worker process updated the member first; re-read and retry
+                        continue
+
+                    print(f"Attached {domain} to pooled CloudFront distribution {distribution_id}")
+                    self.distribution_index.record(updated)
+                    if self.inventory:
+                        self.inventory.record(self.account_key, 'distribution', [domain, f'www.{domain}'], distribution_id,
+                                              DistributionAliasIndex._summary(updated))
+                    return distribution_id, updated['DomainName']
+        return None
+
+    def track_distribution_deployment(self, distribution_id: str):
+        """
+        Have the account's ResourceWatcher follow a new or updated distribution to
+        Deployed without anyone waiting on it; the indexes pick up the final status.
+        """
+        def deployed(future):
+            try:
+                distribution = future.result()
+            except Exception as e:
+                print(f"⚠️ CloudFront distribution {distribution_id} not confirmed deployed: {e}")
+                return
+            print(f"✅ CloudFront distribution {distribution_id} deployed")
+            self.distribution_index.record(distribution)
+            if self.inventory:
+                self.inventory.record(self.account_key, 'distribution', DistributionAliasIndex._aliases(distribution),
+                                      distribution_id, DistributionAliasIndex._summary(distribution))
+
+        self.resource_watcher.watch('distribution', distribution_id,
+                                    timeout=Config.CLOUDFRONT_DEPLOY_TIMEOUT).add_done_callback(deployed)
+
     def create_route53_records(self, zone_id: str, domain: str, cloudfront_distribution_id: str):
         """
         Create Route 53 ALIAS records (automatically resolve to CloudFront IPs - no manual IP management!)
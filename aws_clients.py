@@ -0,0 +1,132 @@
+import threading
+from typing import Dict, Optional, Tuple
+
+import boto3
+from botocore.config import Config as BotoConfig
+
+from config import Config
+from rate_limit import TokenBucket
+from metrics import instrument_client
+
+
+class AWSClientRegistry:
+    """
+    Process-wide cache of long-lived boto3 clients.
+
+    Clients are keyed by (account key, service, region) so every route and every
+    AWSAutomation instance for the same account shares one client and, with it,
+    one botocore connection pool. boto3 clients are thread-safe once created;
+    only creation needs the lock.
+
+    Clients use the adaptive retry mode by default, so the client-side rate
+    limiter botocore keeps per client is shared by every thread calling that
+    account and service: a throttle slows all of them down together instead of
+    each thread backing off and retrying in a burst. Services listed in
+    AWS_RATE_LIMITS additionally get a fixed token bucket per account, acquired
+    before every attempt in any region.
+    """
+
+    def __init__(self, accounts: Dict = None):
+        self.accounts = accounts if accounts is not None else Config.AWS_ACCOUNTS
+        self._sessions: Dict[str, boto3.session.Session] = {}
+        self._clients: Dict[Tuple[str, str, Optional[str]], object] = {}
+        self._rate_limits = self._parse_rate_limits(Config.AWS_RATE_LIMITS)
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _parse_rate_limits(value: str) -> Dict[str, Tuple[float, float]]:
+        """'cloudfront=2,acm=10/20' -> {'cloudfront': (2, 2), 'acm': (10, 20)}"""
+        limits = {}
+        for item in value.split(','):
+            if not item.strip():
+                continue
+            service, _, rate = item.partition('=')
+            rate, _, burst = rate.partition('/')
+            limits[service.strip()] = (float(rate), float(burst or rate))
+        return limits
+
+    def _client_config(self) -> BotoConfig:
+        return BotoConfig(
+            max_pool_connections=Config.AWS_MAX_POOL_CONNECTIONS,
+            connect_timeout=Config.AWS_CONNECT_TIMEOUT,
+            read_timeout=Config.AWS_READ_TIMEOUT,
+            tcp_keepalive=True,
+            retries={'mode': Config.AWS_RETRY_MODE, 'total_max_attempts': Config.AWS_MAX_ATTEMPTS}
+        )
+
+    def _attach_rate_limit(self, client, account_key: str, service: str):
+        # Caller must hold self._lock
+        if service not in self._rate_limits:
+            return
+        bucket = self._buckets.get((account_key, service))
+        if bucket is None:
+            rate, burst = self._rate_limits[service]
+            bucket = self._buckets[(account_key, service)] = TokenBucket(rate, capacity=burst)
+
+        def acquire_token(**kwargs):
+            bucket.acquire()
+
+        client.meta.events.register('before-send', acquire_token)
+
+    def _get_session(self, account_key: str) -> boto3.session.Session:
+        # Caller must hold self._lock
+        session = self._sessions.get(account_key)
+        if session is None:
+            account_config = self.accounts[account_key]
+            session = boto3.session.Session(
+                aws_access_key_id=account_config['access_key_id'],
+                aws_secret_access_key=account_config['secret_access_key']
+            )
+            self._sessions[account_key] = session
+        return session
+
+    def get_client(self, account_key: str, service: str, region_name: Optional[str] = None):
+        """Return the shared client for an account/service/region, creating it once"""
+        if account_key not in self.accounts:
+            raise ValueError(f"Invalid account key: {account_key}")
+
+        key = (account_key, service, region_name)
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                session = self._get_session(account_key)
+                client = session.client(
+                    service,
+                    region_name=region_name,
+                    config=self._client_config()
+                )
+                instrument_client(client)
+                self._attach_rate_limit(client, account_key, service)
+                self._clients[key] = client
+                print(f"🔌 Created shared {service} client for {account_key} ({region_name or 'default region'})")
+            return client
+
+    def get_s3_client(self, account_key: str):
+        """S3 client in the account's configured region"""
+        if account_key not in self.accounts:
+            raise ValueError(f"Invalid account key: {account_key}")
+        return self.get_client(account_key, 's3', self.accounts[account_key]['region'])
+
+    def clear(self):
+        """Drop every cached client (e.g. after credentials were rotated)"""
+        with self._lock:
+            self._clients.clear()
+            self._sessions.clear()
+            self._buckets.clear()
+
+
+# Shared by app.py routes and AWSAutomation
+client_registry = AWSClientRegistry()
+
+
+def get_client(account_key: str, service: str, region_name: Optional[str] = None):
+    return client_registry.get_client(account_key, service, region_name)
+
+
+def get_s3_client(account_key: str):
+    return client_registry.get_s3_client(account_key)
@@ -0,0 +1,208 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set
+
+from config import Config
+
+
+class CertificateIndex:
+    """
+    In-memory SAN -> certificate ARN index of an account's ISSUED ACM certificates.
+
+    The index is refreshed incrementally: every refresh lists the certificate
+    summaries, drops ARNs that are no longer ISSUED and describes only ARNs it
+    has not seen before (in parallel, and only when the summary does not
+    already carry the full SAN list). Lookups are dictionary hits.
+    """
+
+    def __init__(self, acm_client, ttl: int = None, miss_refresh_interval: int = None, max_workers: int = None):
+        self.acm_client = acm_client
+        self.ttl = ttl if ttl is not None else Config.CERT_INDEX_TTL
+        self.miss_refresh_interval = (
+            miss_refresh_interval if miss_refresh_interval is not None else Config.CERT_INDEX_MISS_REFRESH
+        )
+        self.max_workers = max_workers or Config.CERT_INDEX_DESCRIBE_WORKERS
+        self._names_by_arn: Dict[str, Set[str]] = {}
+        self._arns_by_name: Dict[str, Set[str]] = {}
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()          # guards the two maps
+        self._refresh_lock = threading.Lock()  # one refresh at a time
+
+    def _describe_names(self, cert_arn: str) -> Optional[Set[str]]:
+        try:
+            cert = self.acm_client.describe_certificate(CertificateArn=cert_arn)['Certificate']
+        except Exception as e:
+            print(f"Error describing certificate {cert_arn}: {e}")
+            return None
+        if cert['Status'] != 'ISSUED':
+            return None
+        names = {cert['DomainName']}
+        names.update(cert.get('SubjectAlternativeNames', []))
+        return names
+
+    def _list_issued(self) -> Dict[str, Optional[Set[str]]]:
+        """ARN -> SANs from the summaries (None when the summary is truncated)"""
+        issued = {}
+        paginator = self.acm_client.get_paginator('list_certificates')
+        for page in paginator.paginate(CertificateStatuses=['ISSUED']):
+            for summary in page['CertificateSummaryList']:
+                names = None
+                if 'SubjectAlternativeNameSummaries' in summary and not summary.get('HasAdditionalSubjectAlternativeNames'):
+                    names = {summary['DomainName']}
+                    names.update(summary['SubjectAlternativeNameSummaries'])
+                issued[summary['CertificateArn']] = names
+        return issued
+
+    def refresh(self, max_age: float = 0):
+        """Bring the index up to date unless it was refreshed within `max_age` seconds"""
+        with self._refresh_lock:
+            if time.time() - self._refreshed_at < max_age:
+                return
+
+            issued = self._list_issued()
+            with self._lock:
+                known = set(self._names_by_arn)
+
+            new_names = {arn: names for arn, names in issued.items() if arn not in known and names is not None}
+            to_describe = [arn for arn, names in issued.items() if arn not in known and names is None]
+            if to_describe:
+                print(f"Describing {len(to_describe)} new certificate(s) for the index")
+                with ThreadPoolExecutor(max_workers=min(self.max_workers, len(to_describe))) as executor:
+                    for arn, names in zip(to_describe, executor.map(self._describe_names, to_describe)):
+                        if names is not None:
+                            new_names[arn] = names
+
+            with self._lock:
+                for arn in known - set(issued):
+                    self._remove(arn)
+                for arn, names in new_names.items():
+                    self._add(arn, names)
+            self._refreshed_at = time.time()
+
+    def _add(self, cert_arn: str, names: Iterable[str]):
+        # Caller must hold self._lock
+        names = set(names)
+        self._names_by_arn[cert_arn] = names
+        for name in names:
+            self._arns_by_name.setdefault(name, set()).add(cert_arn)
+
+    def _remove(self, cert_arn: str):
+        # Caller must hold self._lock
+        for name in self._names_by_arn.pop(cert_arn, ()):
+            arns = self._arns_by_name.get(name)
+            if arns is not None:
+                arns.discard(cert_arn)
+                if not arns:
+                    del self._arns_by_name[name]
+
+    def add(self, cert_arn: str, names: Iterable[str]):
+        """Record an ISSUED certificate without waiting for the next refresh"""
+        with self._lock:
+            self._remove(cert_arn)
+            self._add(cert_arn, names)
+
+    def remove(self, cert_arn: str):
+        with self._lock:
+            self._remove(cert_arn)
+
+    def _lookup(self, domain: str) -> Optional[str]:
+        with self._lock:
+            arns = self._arns_by_name.get(domain, set()) & self._arns_by_name.get(f'*.{domain}', set())
+            return min(arns) if arns else None
+
+    def find(self, domain: str) -> Optional[str]:
+        """ARN of an ISSUED certificate covering both `domain` and `*.domain`"""
+        self.refresh(max_age=self.ttl)
+        cert_arn = self._lookup(domain)
+        if cert_arn is None:
+            # A certificate may have been issued since the last refresh
+            self.refresh(max_age=self.miss_refresh_interval)
+            cert_arn = self._lookup(domain)
+        return cert_arn
+
+    def certificates(self) -> Dict[str, List[str]]:
+        with self._lock:
+            return {arn: sorted(names) for arn, names in self._names_by_arn.items()}
+
+
+class DistributionAliasIndex:
+    """
+    In-memory alias -> CloudFront distribution index for one account.
+
+    The whole distribution list is re-read at most once per TTL (or once per
+    miss-refresh interval when a lookup misses); distributions created by this
+    app are written through immediately via `record()`.
+    """
+
+    def __init__(self, cloudfront_client, ttl: int = None, miss_refresh_interval: int = None):
+        self.cloudfront_client = cloudfront_client
+        self.ttl = ttl if ttl is not None else Config.CLOUDFRONT_INDEX_TTL
+        self.miss_refresh_interval = (
+            miss_refresh_interval if miss_refresh_interval is not None else Config.CLOUDFRONT_INDEX_MISS_REFRESH
+        )
+        self._by_alias: Dict[str, Dict] = {}
+        self._recorded: Dict[str, tuple] = {}
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    @staticmethod
+    def _summary(distribution: Dict) -> Dict:
+        return {
+            'distribution_id': distribution['Id'],
+            'domain_name': distribution['DomainName'],
+            'status': distribution['Status'],
+            'enabled': distribution.get('Enabled', distribution.get('DistributionConfig', {}).get('Enabled'))
+        }
+
+    @staticmethod
+    def _aliases(distribution: Dict) -> List[str]:
+        aliases = distribution.get('Aliases') or distribution.get('DistributionConfig', {}).get('Aliases', {})
+        return aliases.get('Items', [])
+
+    def refresh(self, max_age: float = 0):
+        """Re-list the account's distributions unless refreshed within `max_age` seconds"""
+        with self._refresh_lock:
+            if time.time() - self._refreshed_at < max_age:
+                return
+
+            started_at = time.time()
+            by_alias = {}
+            paginator = self.cloudfront_client.get_paginator('list_distributions')
+            for page in paginator.paginate():
+                for distribution in page['DistributionList'].get('Items', []):
+                    summary = self._summary(distribution)
+                    for alias in self._aliases(distribution):
+                        by_alias[alias] = summary
+
+            with self._lock:
+                # Keep write-throughs that landed while the listing was running
+                for alias, (summary, recorded_at) in self._recorded.items():
+                    if recorded_at >= started_at:
+                        by_alias[alias] = summary
+                self._recorded.clear()
+                self._by_alias = by_alias
+            self._refreshed_at = time.time()
+
+    def record(self, distribution: Dict):
+        """Write through a distribution returned by create/get/update_distribution"""
+        summary = self._summary(distribution)
+        now = time.time()
+        with self._lock:
+            for alias in self._aliases(distribution):
+                self._by_alias[alias] = summary
+                self._recorded[alias] = (summary, now)
+
+    def _lookup(self, domain: str) -> Optional[Dict]:
+        with self._lock:
+            return self._by_alias.get(domain) or self._by_alias.get(f'www.{domain}')
+
+    def find(self, domain: str) -> Optional[Dict]:
+        """Distribution serving `domain` or `www.domain`, if any"""
+        self.refresh(max_age=self.ttl)
+        summary = self._lookup(domain)
+        if summary is None:
+            self.refresh(max_age=self.miss_refresh_interval)
+            summary = self._lookup(domain)
+        return dict(summary) if summary else None
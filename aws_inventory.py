@@ -0,0 +1,278 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from aws_clients import get_client, get_s3_client
+from config import Config
+from task_store import SQLiteStore
+
+KINDS = ('certificate', 'hosted_zone', 'distribution', 'bucket')
+
+
+class InventoryStore(SQLiteStore):
+    """
+    Local index of every account's AWS resources, one row per (name, resource).
+
+    Rows are keyed by (account_key, kind, name, resource_id): certificates are
+    stored once per SAN, distributions once per alias, hosted zones and buckets
+    once per name. `inventory_syncs` records when each (account, kind) was last
+    fully synced so readers can tell whether a miss can be trusted.
+    """
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS inventory_resources (
+            account_key TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            name TEXT NOT NULL,
+            resource_id TEXT NOT NULL,
+            data TEXT NOT NULL,
+            synced_at REAL NOT NULL,
+            PRIMARY KEY (account_key, kind, name, resource_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_inventory_resources_resource
+            ON inventory_resources (account_key, kind, resource_id);
+        CREATE TABLE IF NOT EXISTS inventory_syncs (
+            account_key TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            synced_at REAL NOT NULL,
+            PRIMARY KEY (account_key, kind)
+        );
+    '''
+
+    def rows(self, account_key: str, kind: str) -> Dict[Tuple[str, str], str]:
+        """(name, resource_id) -> serialized data for one account and kind"""
+        rows = self._connection().execute(
+            'SELECT name, resource_id, data FROM inventory_resources WHERE account_key = ? AND kind = ?',
+            (account_key, kind)
+        ).fetchall()
+        return {(name, resource_id): data for name, resource_id, data in rows}
+
+    def sync(self, account_key: str, kind: str, current: Dict[Tuple[str, str], Dict]) -> Tuple[int, int]:
+        """
+        Make the stored rows for (account, kind) match `current`, writing only the
+        difference. Returns (rows written, rows deleted).
+        """
+        now = time.time()
+        stored = self.rows(account_key, kind)
+        current = {key: json.dumps(data, sort_keys=True, default=str) for key, data in current.items()}
+        changed = [(account_key, kind, name, resource_id, data, now)
+                   for (name, resource_id), data in current.items() if stored.get((name, resource_id)) != data]
+        removed = [(account_key, kind, name, resource_id) for name, resource_id in set(stored) - set(current)]
+
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(
+                '''INSERT INTO inventory_resources (account_key, kind, name, resource_id, data, synced_at)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(account_key, kind, name, resource_id) DO UPDATE SET
+                       data = excluded.data,
+                       synced_at = excluded.synced_at''',
+                changed
+            )
+            connection.executemany(
+                'DELETE FROM inventory_resources WHERE account_key = ? AND kind = ? AND name = ? AND resource_id = ?',
+                removed
+            )
+            connection.execute(
+                '''INSERT INTO inventory_syncs (account_key, kind, synced_at) VALUES (?, ?, ?)
+                   ON CONFLICT(account_key, kind) DO UPDATE SET synced_at = excluded.synced_at''',
+                (account_key, kind, now)
+            )
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return len(changed), len(removed)
+
+    def record(self, account_key: str, kind: str, names: Iterable[str], resource_id: str, data: Dict):
+        """Write through one resource created by this app without waiting for the next sync"""
+        now = time.time()
+        document = json.dumps(data, sort_keys=True, default=str)
+        self._connection().executemany(
+            '''INSERT INTO inventory_resources (account_key, kind, name, resource_id, data, synced_at)
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT(account_key, kind, name, resource_id) DO UPDATE SET
+                   data = excluded.data,
+                   synced_at = excluded.synced_at''',
+            [(account_key, kind, name, resource_id, document, now) for name in names]
+        )
+
+    def lookup(self, account_key: str, kind: str, names: List[str]) -> Dict[str, List[Tuple[str, Dict]]]:
+        """name -> [(resource_id, data)] for the requested names"""
+        found: Dict[str, List[Tuple[str, Dict]]] = {}
+        for start in range(0, len(names), 500):
+            chunk = names[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self._connection().execute(
+                f'''SELECT name, resource_id, data FROM inventory_resources
+                    WHERE account_key = ? AND kind = ? AND name IN ({placeholders})
+                    ORDER BY resource_id''',
+                [account_key, kind, *chunk]
+            ).fetchall()
+            for name, resource_id, data in rows:
+                found.setdefault(name, []).append((resource_id, json.loads(data)))
+        return found
+
+    def synced_at(self, account_key: str, kind: str) -> float:
+        row = self._connection().execute(
+            'SELECT synced_at FROM inventory_syncs WHERE account_key = ? AND kind = ?', (account_key, kind)
+        ).fetchone()
+        return row[0] if row else 0.0
+
+
+class InventoryService:
+    """
+    Background sync of every configured account's ACM certificates, hosted
+    zones, CloudFront distributions and S3 buckets into an InventoryStore.
+
+    Syncs are incremental: certificates already indexed are never described
+    again, and only changed rows are written. Every worker process may run the
+    sync loop; an (account, kind) synced by another process within the interval
+    is skipped. Lookups only trust the inventory while it is fresh (synced
+    within `max_age`), and even then only its hits: callers check misses
+    against the AWS APIs, since a resource may have been created since.
+    """
+
+    def __init__(self, store: InventoryStore, accounts: Iterable[str] = None,
+                 interval: int = None, max_age: int = None):
+        self.store = store
+        self.accounts = list(accounts if accounts is not None else Config.AWS_ACCOUNTS)
+        self.interval = interval if interval is not None else Config.INVENTORY_SYNC_INTERVAL
+        self.max_age = max_age if max_age is not None else Config.INVENTORY_MAX_AGE
+        self._sync_lock = threading.Lock()
+        self._thread_pid = None
+
+    # Background sync
+
+    def start(self):
+        """Start the sync loop in this process (no-op if already running or disabled)"""
+        if self.interval <= 0 or self._thread_pid == os.getpid():
+            return
+        self._thread_pid = os.getpid()
+        threading.Thread(target=self._sync_loop, daemon=True, name='aws-inventory-sync').start()
+
+    def _sync_loop(self):
+        while True:
+            self.sync_all(max_age=self.interval)
+            time.sleep(self.interval)
+
+    def sync_all(self, max_age: float = 0):
+        for account_key in self.accounts:
+            try:
+                self.sync_account(account_key, max_age=max_age)
+            except Exception as e:
+                print(f"❌ Inventory sync failed for {account_key}: {e}")
+
+    def sync_account(self, account_key: str, max_age: float = 0):
+        with self._sync_lock:
+            for kind in KINDS:
+                if time.time() - self.store.synced_at(account_key, kind) < max_age:
+                    continue
+                try:
+                    started_at = time.time()
+                    current = getattr(self, f'_list_{kind}s')(account_key)
+                    written, deleted = self.store.sync(account_key, kind, current)
+                    print(f"🗂️ Inventory {account_key}/{kind}: {len(current)} rows, "
+                          f"{written} written, {deleted} deleted in {time.time() - started_at:.1f}s")
+                except Exception as e:
+                    print(f"❌ Inventory sync of {account_key}/{kind} failed: {e}")
+
+    # Listings
+
+    def _list_certificates(self, account_key: str) -> Dict[Tuple[str, str], Dict]:
+        acm = get_client(account_key, 'acm', 'us-east-1')
+        known: Dict[str, List[str]] = {}
+        for name, arn in self.store.rows(account_key, 'certificate'):
+            known.setdefault(arn, []).append(name)
+
+        current = {}
+        paginator = acm.get_paginator('list_certificates')
+        for page in paginator.paginate(CertificateStatuses=['ISSUED']):
+            for summary in page['CertificateSummaryList']:
+                arn = summary['CertificateArn']
+                if arn in known:
+                    names = known[arn]
+                elif 'SubjectAlternativeNameSummaries' in summary and not summary.get('HasAdditionalSubjectAlternativeNames'):
+                    names = [summary['DomainName'], *summary['SubjectAlternativeNameSummaries']]
+                else:
+                    cert = acm.describe_certificate(CertificateArn=arn)['Certificate']
+                    names = [cert['DomainName'], *cert.get('SubjectAlternativeNames', [])]
+                for name in set(names):
+                    current[(name, arn)] = {}
+        return current
+
+    def _list_hosted_zones(self, account_key: str) -> Dict[Tuple[str, str], Dict]:
+        route53 = get_client(account_key, 'route53')
+        current = {}
+        paginator = route53.get_paginator('list_hosted_zones')
+        for page in paginator.paginate():
+            for zone in page['HostedZones']:
+                current[(zone['Name'].rstrip('.'), zone['Id'].split('/')[-1])] = {
+                    'name': zone['Name'],
+                    'private': zone.get('Config', {}).get('PrivateZone', False)
+                }
+        return current
+
+    def _list_distributions(self, account_key: str) -> Dict[Tuple[str, str], Dict]:
+        cloudfront = get_client(account_key, 'cloudfront')
+        current = {}
+        paginator = cloudfront.get_paginator('list_distributions')
+        for page in paginator.paginate():
+            for distribution in page['DistributionList'].get('Items', []):
+                summary = {
+                    'distribution_id': distribution['Id'],
+                    'domain_name': distribution['DomainName'],
+                    'status': distribution['Status'],
+                    'enabled': distribution.get('Enabled')
+                }
+                for alias in distribution.get('Aliases', {}).get('Items', []):
+                    current[(alias, distribution['Id'])] = summary
+        return current
+
+    def _list_buckets(self, account_key: str) -> Dict[Tuple[str, str], Dict]:
+        response = get_s3_client(account_key).list_buckets()
+        return {(bucket['Name'], bucket['Name']): {} for bucket in response.get('Buckets', [])}
+
+    # Lookups
+
+    def is_fresh(self, account_key: str, kind: str) -> bool:
+        return time.time() - self.store.synced_at(account_key, kind) < self.max_age
+
+    def lookup(self, account_key: str, kind: str, names: List[str]) -> Optional[Dict[str, List[Tuple[str, Dict]]]]:
+        """Stored matches for `names`, or None when the inventory is too stale to trust a miss"""
+        if not self.is_fresh(account_key, kind):
+            return None
+        return self.store.lookup(account_key, kind, list(names))
+
+    def covering_certificates(self, account_key: str, domain: str) -> Optional[List[str]]:
+        """ARNs of ISSUED certificates covering `domain` and `*.domain`; None when stale"""
+        found = self.lookup(account_key, 'certificate', [domain, f'*.{domain}'])
+        if found is None:
+            return None
+        arns = ({arn for arn, _ in found.get(domain, [])} &
+                {arn for arn, _ in found.get(f'*.{domain}', [])})
+        return sorted(arns)
+
+    def record(self, account_key: str, kind: str, names: Iterable[str], resource_id: str, data: Dict = None):
+        try:
+            self.store.record(account_key, kind, names, resource_id, data or {})
+        except Exception as e:
+            print(f"❌ Inventory write-through failed for {account_key}/{kind}: {e}")
+
+
+_inventory = None
+_inventory_lock = threading.Lock()
+
+
+def get_inventory() -> Optional[InventoryService]:
+    """Process-wide inventory service; None when the inventory is disabled"""
+    global _inventory
+    if not Config.INVENTORY_ENABLED:
+        return None
+    with _inventory_lock:
+        if _inventory is None:
+            _inventory = InventoryService(InventoryStore(Config.TASK_DB_PATH))
+        return _inventory
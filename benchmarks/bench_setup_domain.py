@@ -0,0 +1,368 @@
+"""
+Offline benchmark for AWSAutomation.setup_domain.
+
+Runs N domain setups through the DomainTaskScheduler against moto (local AWS
+stand-in) and a small fake Namecheap XML API served from a local thread, with
+injectable latency and throttling on both. Reports wall time, per-step
+p50/p99 and API call counts so concurrency and caching changes can be compared
+without touching real accounts.
+
+Requires moto (not an app dependency):
+
+    pip install "moto[acm,cloudfront,route53,s3]"
+    python benchmarks/bench_setup_domain.py --domains 50 --aws-latency 0.05 --aws-throttle-rate 0.02
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import quoteattr
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeNamecheap:
+    """Just enough of the Namecheap XML API for setup_domain: getHosts, setHosts and setCustom"""
+
+    def __init__(self, latency: float = 0.0, throttle_rate: float = 0.0):
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.hosts: Dict[str, List[Dict]] = {}
+        self.calls: Dict[str, int] = {}
+        self.throttled = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server.server_address[1]}/xml.response'
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True, name='fake-namecheap').start()
+
+    def stop(self):
+        self.server.shutdown()
+
+    def handle(self, params: Dict[str, str]) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        command = params.get('Command', '')
+        domain = f"{params.get('SLD')}.{params.get('TLD')}"
+        with self._lock:
+            self.calls[command] = self.calls.get(command, 0) + 1
+            if random.random() < self.throttle_rate:
+                self.throttled += 1
+                return ('<ApiResponse Status="ERROR"><Errors>'
+                        '<Error Number="500000">Too many requests</Error></Errors></ApiResponse>')
+
+            if command == 'namecheap.domains.dns.getHosts':
+                hosts = ''.join(
+                    f'<host Name={quoteattr(h["Name"])} Type={quoteattr(h["Type"])} '
+                    f'Address={quoteattr(h["Address"])} TTL={quoteattr(h["TTL"])} />'
+                    for h in self.hosts.get(domain, [])
+                )
+                result = f'<DomainDNSGetHostsResult Domain={quoteattr(domain)}>{hosts}</DomainDNSGetHostsResult>'
+            elif command == 'namecheap.domains.dns.setHosts':
+                hosts, index = [], 1
+                while f'HostName{index}' in params:
+                    hosts.append({
+                        'Name': params[f'HostName{index}'],
+                        'Type': params[f'RecordType{index}'],
+                        'Address': params[f'Address{index}'],
+                        'TTL': params.get(f'TTL{index}', '1800')
+                    })
+                    index += 1
+                self.hosts[domain] = hosts
+                result = f'<DomainDNSSetHostsResult Domain={quoteattr(domain)} IsSuccess="true" />'
+            elif command == 'namecheap.domains.dns.setCustom':
+                result = f'<DomainDNSSetCustomResult Domain={quoteattr(domain)} Update="true" />'
+            else:
+                return f'<ApiResponse Status="ERROR"><Errors><Error Number="1">Unknown command {command}</Error></Errors></ApiResponse>'
+        return f'<ApiResponse Status="OK"><Errors /><CommandResponse>{result}</CommandResponse></ApiResponse>'
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self, query: str):
+                params = {key: values[-1] for key, values in parse_qs(query).items()}
+                body = fake.handle(params).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/xml')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._respond(urlparse(self.path).query)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                self._respond(self.rfile.read(length).decode())
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+# Throttling error bodies per botocore protocol
+THROTTLE_RESPONSES = {
+    'json': (400, {'x-amzn-ErrorType': 'ThrottlingException'},
+             '{"__type": "ThrottlingException", "message": "Rate exceeded"}'),
+    'rest-xml': (400, {},
+                 '<ErrorResponse><Error><Type>Sender</Type><Code>Throttling</Code>'
+                 '<Message>Rate exceeded</Message></Error></ErrorResponse>'),
+    's3': (503, {}, '<Error><Code>SlowDown</Code><Message>Please reduce your request rate.</Message></Error>'),
+}
+
+
+def inject_aws_faults(client, latency: float, throttle_rate: float):
+    """
+    Delay every request and answer a fraction of them with a throttling error.
+
+    botocore calls every before-send handler, so the fault injector replaces
+    moto's stubber on this client and only forwards requests it lets through;
+    a throttled request must never reach moto.
+    """
+    from botocore.awsrequest import AWSResponse
+    from moto.core.botocore_stubber import MockRawResponse
+    from moto.core.models import botocore_stubber
+
+    service_model = client.meta.service_model
+    status, headers, body = THROTTLE_RESPONSES['s3' if service_model.service_name == 's3'
+                                                else service_model.protocol]
+
+    def before_send(request, **kwargs):
+        if latency:
+            time.sleep(latency)
+        if random.random() < throttle_rate:
+            return AWSResponse(request.url, status, headers, MockRawResponse(body))
+        return botocore_stubber(request=request, **kwargs)
+
+    client.meta.events.unregister('before-send', botocore_stubber)
+    client.meta.events.register_first('before-send', before_send)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--domains', type=int, default=20, help='number of domains to set up')
+    parser.add_argument('--concurrency', type=int, default=10, help='SETUP_MAX_CONCURRENCY')
+    parser.add_argument('--per-account', type=int, default=5, help='SETUP_MAX_CONCURRENCY_PER_ACCOUNT')
+    parser.add_argument('--aws-latency', type=float, default=0.0, help='seconds added to every AWS request')
+    parser.add_argument('--aws-throttle-rate', type=float, default=0.0, help='fraction of AWS requests throttled')
+    parser.add_argument('--namecheap-latency', type=float, default=0.0, help='seconds added to every Namecheap call')
+    parser.add_argument('--namecheap-throttle-rate', type=float, default=0.0,
+                        help='fraction of Namecheap calls answered with error 500000')
+    parser.add_argument('--namecheap-rate-per-minute', type=int, default=6000,
+                        help='local Namecheap rate limit (the production default of 20 dominates any run)')
+    parser.add_argument('--acm-validation-wait', type=int, default=0,
+                        help='seconds moto keeps certificates in PENDING_VALIDATION')
+    parser.add_argument('--engine', choices=('threads', 'asyncio'), default='threads',
+                        help='SETUP_ENGINE: blocking setup_domain on scheduler threads, or the asyncio engine')
+    parser.add_argument('--pack-certificates', action='store_true',
+                        help='share multi-SAN certificates across the batch (ACM_MAX_SANS names each)')
+    parser.add_argument('--validation-mode', choices=('namecheap', 'route53'), default='namecheap',
+                        help='CERT_VALIDATION_MODE: validation CNAMEs in Namecheap DNS or in the Route 53 zone')
+    parser.add_argument('--seed', type=int, default=None, help='random seed for fault injection')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    parser.add_argument('--verbose', action='store_true', help='keep the app\'s own output')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    namecheap = FakeNamecheap(args.namecheap_latency, args.namecheap_throttle_rate)
+    namecheap.start()
+    state_dir = tempfile.mkdtemp(prefix='bench-setup-domain-')
+
+    # Config (and moto) read the environment at import time
+    os.environ.update({
+        'AWS_ACCESS_KEY_ID': 'bench', 'AWS_SECRET_ACCESS_KEY': 'bench', 'AWS_DEFAULT_REGION': 'us-east-1',
+        'AWS_REGION': 'us-east-1', 'MOTO_ACM_VALIDATION_WAIT': str(args.acm_validation_wait),
+        'NAMECHEAP_API_USER': 'bench', 'NAMECHEAP_API_KEY': 'bench', 'NAMECHEAP_CLIENT_IP': '127.0.0.1',
+        'NAMECHEAP_API_URL': namecheap.url, 'NAMECHEAP_RATE_PER_MINUTE': str(args.namecheap_rate_per_minute),
+        'NAMECHEAP_RATE_PER_HOUR': str(args.namecheap_rate_per_minute * 60),
+        'TASK_DB_PATH': os.path.join(state_dir, 'state.sqlite3'), 'INVENTORY_ENABLED': 'false',
+    })
+    sys.path.insert(0, ROOT)
+
+    # Imported after the environment is set: moto reads MOTO_ACM_VALIDATION_WAIT at import
+    try:
+        from moto import mock_aws
+    except ImportError:
+        sys.exit('moto is required for this benchmark: pip install "moto[acm,cloudfront,route53,s3]"')
+
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, 'w'))
+    with mock_aws(), output:
+        import metrics
+        from api_accounting import track_api_calls
+        from async_automation import AsyncSetupRunner
+        from aws_automation import AWSAutomation, namecheap_transport
+        from certificate_packs import build_certificate_packs
+        from task_scheduler import DomainTaskScheduler
+
+        # Talk to the fake Namecheap server directly, not through the proxy
+        namecheap_transport.session().proxies.clear()
+
+        automation = AWSAutomation.for_account('auto-insurance')
+        automation.dns_resolver = None  # moto records are not in public DNS
+        for client in (automation.acm_client, automation.route53_client,
+                       automation.s3_client, automation.cloudfront_client):
+            inject_aws_faults(client, args.aws_latency, args.aws_throttle_rate)
+
+        scheduler = DomainTaskScheduler(args.concurrency, args.per_account)
+        step_durations: Dict[str, List[float]] = {}
+        results, api_calls, setup_times = [], [], []
+        lock = threading.Lock()
+        finished = threading.Semaphore(0)
+
+        peak_threads = threading.active_count()
+
+        domains = [f'bench-{index:04d}.example.com' for index in range(args.domains)]
+        packs = build_certificate_packs(domains) if args.pack_certificates else {}
+
+        def progress_recorder():
+            step_started = {}
+
+            def progress(message, step_key=None, step_status=None):
+                nonlocal peak_threads
+                if not step_key:
+                    return
+                now = time.monotonic()
+                step_started.setdefault(step_key, now)
+                with lock:
+                    peak_threads = max(peak_threads, threading.active_count())
+                    if step_status in ('completed', 'failed'):
+                        step_durations.setdefault(step_key, []).append(now - step_started[step_key])
+            return progress
+
+        def record(result, counter, started_at):
+            with lock:
+                results.append(result)
+                api_calls.append(counter.summary())
+                setup_times.append(time.monotonic() - started_at)
+
+        def run(domain):
+            started_at = time.monotonic()
+            try:
+                with track_api_calls(f'benchmark setup of {domain}') as counter:
+                    result = automation.setup_domain(domain, progress_callback=progress_recorder(),
+                                                     certificate_pack=packs.get(domain),
+                                                     validation_mode=args.validation_mode)
+                record(result, counter, started_at)
+            finally:
+                finished.release()
+
+        runner = AsyncSetupRunner()
+        async_automation = runner.automation('auto-insurance')
+
+        async def run_async(domain):
+            started_at = time.monotonic()
+            try:
+                with track_api_calls(f'benchmark setup of {domain}') as counter:
+                    result = await async_automation.setup_domain(domain, progress_callback=progress_recorder(),
+                                                                 certificate_pack=packs.get(domain),
+                                                                 validation_mode=args.validation_mode)
+                record(result, counter, started_at)
+            finally:
+                finished.release()
+
+        def aws_call_totals() -> Dict[str, int]:
+            # Every AWS call of the process, including background pollers no task is charged for
+            totals: Dict[str, int] = {}
+            for metric in metrics.AWS_API_DURATION.collect():
+                for sample in metric.samples:
+                    if sample.name.endswith('_count'):
+                        service = sample.labels['service']
+                        totals[service] = totals.get(service, 0) + int(sample.value)
+            return totals
+
+        if args.engine == 'asyncio':
+            start = lambda cancel_event, domain: runner.submit(run_async(domain))
+        else:
+            start = lambda cancel_event, domain: run(domain)
+
+        started_at = time.monotonic()
+        for domain in domains:
+            scheduler.submit(domain, 'auto-insurance', lambda cancel_event, domain=domain: start(cancel_event, domain))
+        for _ in domains:
+            finished.acquire()
+        wall_time = time.monotonic() - started_at
+        process_calls = aws_call_totals()
+
+    namecheap.stop()
+
+    by_service: Dict[str, Dict[str, int]] = {}
+    for summary in api_calls:
+        for service, counts in summary['by_service'].items():
+            totals = by_service.setdefault(service, dict.fromkeys(counts, 0))
+            for field, value in counts.items():
+                totals[field] += value
+
+    report = {
+        'engine': args.engine,
+        'pack_certificates': args.pack_certificates,
+        'validation_mode': args.validation_mode,
+        'domains': args.domains,
+        'completed': sum(1 for result in results if result['status'] == 'completed'),
+        'failed': sum(1 for result in results if result['status'] != 'completed'),
+        'wall_time': round(wall_time, 3),
+        'domains_per_minute': round(args.domains / wall_time * 60, 1) if wall_time else None,
+        'setup_time': {'p50': round(percentile(setup_times, 50), 3), 'p99': round(percentile(setup_times, 99), 3)},
+        'steps': {
+            step: {'count': len(values), 'p50': round(percentile(values, 50), 3),
+                   'p99': round(percentile(values, 99), 3), 'max': round(max(values), 3)}
+            for step, values in step_durations.items()
+        },
+        'api_calls': by_service,
+        'aws_calls_in_process': process_calls,
+        'peak_threads': peak_threads,
+        'namecheap_server': {'calls': namecheap.calls, 'throttled': namecheap.throttled},
+        'errors': sorted({result.get('error') for result in results if result.get('error')}),
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Domains: {report['domains']} ({report['completed']} completed, {report['failed']} failed), "
+          f"{report['engine']} engine, peak {report['peak_threads']} threads")
+    print(f"Wall time: {report['wall_time']:.2f}s ({report['domains_per_minute']} domains/min), "
+          f"setup p50 {report['setup_time']['p50']:.2f}s p99 {report['setup_time']['p99']:.2f}s")
+    print(f"\n{'step':<24}{'count':>7}{'p50 (s)':>10}{'p99 (s)':>10}{'max (s)':>10}")
+    for step, stats in report['steps'].items():
+        print(f"{step:<24}{stats['count']:>7}{stats['p50']:>10.3f}{stats['p99']:>10.3f}{stats['max']:>10.3f}")
+    print(f"\n{'service':<24}{'calls':>7}{'retries':>10}{'throttles':>10}{'errors':>10}")
+    for service, counts in sorted(by_service.items()):
+        print(f"{service:<24}{counts['calls']:>7}{counts['retries']:>10}{counts['throttles']:>10}{counts['errors']:>10}")
+    print(f"\nAWS calls in the process, including background pollers: {report['aws_calls_in_process']}")
+    print(f"Fake Namecheap server: {report['namecheap_server']}")
+    for error in report['errors']:
+        print(f"Error: {error}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Hashable, List, Tuple
+
+from config import Config
+
+
+class CertificatePack:
+    """
+    Domains of one setup batch that share a single multi-SAN ACM certificate.
+
+    Every phase of the pack (requesting the certificate and pushing all its
+    validation CNAMEs, waiting for validation) is done once: the first task to
+    reach a phase does the work for the whole pack, the others wait for its
+    result. Packs live in the process that scheduled the batch.
+    """
+
+    def __init__(self, domains: List[str]):
+        self.domains = list(domains)
+        self._phases: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def claim(self, phase: Hashable) -> Tuple[Future, bool]:
+        """The phase's future, and whether the caller must do the work and resolve it"""
+        with self._lock:
+            future = self._phases.get(phase)
+            if future is not None:
+                return future, False
+            future = self._phases[phase] = Future()
+            return future, True
+
+    def run_once(self, phase: Hashable, func: Callable[[], object]):
+        future, leader = self.claim(phase)
+        if leader:
+            try:
+                future.set_result(func())
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+    async def run_once_async(self, phase: Hashable, func: Callable[[], Awaitable[object]]):
+        future, leader = self.claim(phase)
+        if leader:
+            try:
+                future.set_result(await func())
+            except Exception as e:
+                future.set_exception(e)
+        return await asyncio.wrap_future(future)
+
+
+def build_certificate_packs(domains: List[str], max_sans: int = None) -> Dict[str, CertificatePack]:
+    """Split a batch into packs of up to `max_sans` names (each domain takes two: apex and wildcard)"""
+    domains = list(dict.fromkeys(domains))
+    per_pack = max(1, (max_sans or Config.ACM_MAX_SANS) // 2)
+    packs = {}
+    for start in range(0, len(domains), per_pack):
+        pack = CertificatePack(domains[start:start + per_pack])
+        for domain in pack.domains:
+            packs[domain] = pack
+    return packs
+
+
+def validation_records_by_domain(records: List[Dict], domains: List[str]) -> Dict[str, List[Dict]]:
+    """Assign a pack certificate's validation CNAMEs (_token.<name>.) to the pack domain they belong to"""
+    by_domain = {domain: [] for domain in domains}
+    # Longest domain first, so sub.example.com records are not claimed by example.com
+    candidates = sorted(domains, key=len, reverse=True)
+    for record in records:
+        name = record['name'].rstrip('.').lower()
+        for domain in candidates:
+            if name == domain.lower() or name.endswith(f'.{domain.lower()}'):
+                if record not in by_domain[domain]:
+                    by_domain[domain].append(record)
+                break
+    return by_domain
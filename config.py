@@ -29,11 +29,81 @@ class Config:
     AWS_SECRET_ACCESS_KEY_OTHER = os.getenv('AWS_SECRET_ACCESS_KEY_OTHER')
     AWS_REGION_OTHER = os.getenv('AWS_REGION_OTHER', 'us-east-1')
     
+    # Pre-created, deployed CloudFront distributions new domains are attached to
+    # (comma-separated ids per account; empty = one dedicated distribution per domain)
+    CLOUDFRONT_POOL = os.getenv('CLOUDFRONT_POOL', '')
+    CLOUDFRONT_POOL_OTHER = os.getenv('CLOUDFRONT_POOL_OTHER', '')
+    CLOUDFRONT_POOL_MAX_ALIASES = int(os.getenv('CLOUDFRONT_POOL_MAX_ALIASES', '100'))  # CloudFront quotas
+    CLOUDFRONT_POOL_MAX_ORIGINS = int(os.getenv('CLOUDFRONT_POOL_MAX_ORIGINS', '25'))
+    CLOUDFRONT_POOL_FUNCTION = os.getenv('CLOUDFRONT_POOL_FUNCTION', 'pooled-domain-origin-router')
+
+    # Shared boto3 client tuning (see aws_clients.py)
+    AWS_MAX_POOL_CONNECTIONS = int(os.getenv('AWS_MAX_POOL_CONNECTIONS', '50'))
+    AWS_CONNECT_TIMEOUT = int(os.getenv('AWS_CONNECT_TIMEOUT', '10'))
+    AWS_READ_TIMEOUT = int(os.getenv('AWS_READ_TIMEOUT', '60'))
+    # 'adaptive' adds botocore's client-side rate limiter, shared by every thread using a client
+    AWS_RETRY_MODE = os.getenv('AWS_RETRY_MODE', 'adaptive')
+    AWS_MAX_ATTEMPTS = int(os.getenv('AWS_MAX_ATTEMPTS', '8'))  # including the first attempt
+    # Optional fixed per-account ceilings, e.g. 'cloudfront=2,acm=10/20' (requests per second[/burst])
+    AWS_RATE_LIMITS = os.getenv('AWS_RATE_LIMITS', '')
+
+    # ACM certificate index (see aws_indexes.py)
+    CERT_INDEX_TTL = int(os.getenv('CERT_INDEX_TTL', '300'))
+    CERT_INDEX_MISS_REFRESH = int(os.getenv('CERT_INDEX_MISS_REFRESH', '10'))
+    CERT_INDEX_DESCRIBE_WORKERS = int(os.getenv('CERT_INDEX_DESCRIBE_WORKERS', '8'))
+
+    # Provisioning waits (see waiters.py)
+    CERT_RECORDS_TIMEOUT = int(os.getenv('CERT_RECORDS_TIMEOUT', '30'))
+    DNS_PROPAGATION_TIMEOUT = int(os.getenv('DNS_PROPAGATION_TIMEOUT', '300'))
+    DNS_RESOLVER_NAMESERVERS = os.getenv('DNS_RESOLVER_NAMESERVERS', '1.1.1.1,8.8.8.8')
+    S3_POLICY_TIMEOUT = int(os.getenv('S3_POLICY_TIMEOUT', '30'))
+    # 'namecheap' (validation CNAMEs in Namecheap DNS) or 'route53' (in the new hosted zone, delegated early)
+    CERT_VALIDATION_MODE = os.getenv('CERT_VALIDATION_MODE', 'namecheap').lower()
+    ROUTE53_CHANGE_TIMEOUT = int(os.getenv('ROUTE53_CHANGE_TIMEOUT', '300'))
+    # Seconds the resource watcher follows a new or updated distribution to Deployed; setups do not wait on it
+    CLOUDFRONT_DEPLOY_TIMEOUT = int(os.getenv('CLOUDFRONT_DEPLOY_TIMEOUT', '1200'))
+    # Names per certificate when a batch packs its domains (ACM's default quota; apex + wildcard per domain)
+    ACM_MAX_SANS = int(os.getenv('ACM_MAX_SANS', '10'))
+    # Seconds between the per-account status rounds of resource_watcher.py
+    RESOURCE_WATCHER_INTERVAL = float(os.getenv('RESOURCE_WATCHER_INTERVAL', '5'))
+
+    # CloudFront alias index (see aws_indexes.py)
+    CLOUDFRONT_INDEX_TTL = int(os.getenv('CLOUDFRONT_INDEX_TTL', '300'))
+    CLOUDFRONT_INDEX_MISS_REFRESH = int(os.getenv('CLOUDFRONT_INDEX_MISS_REFRESH', '30'))
+
+    # Domain setup scheduling (see task_scheduler.py)
+    SETUP_MAX_CONCURRENCY = int(os.getenv('SETUP_MAX_CONCURRENCY', '10'))
+    SETUP_MAX_CONCURRENCY_PER_ACCOUNT = int(os.getenv('SETUP_MAX_CONCURRENCY_PER_ACCOUNT', '5'))
+    CHECK_EXISTING_MAX_WORKERS = int(os.getenv('CHECK_EXISTING_MAX_WORKERS', '16'))
+    # 'threads' runs each setup on scheduler threads; 'asyncio' drives all setups from one event loop
+    # (see async_automation.py) - raise SETUP_MAX_CONCURRENCY accordingly, waits then hold no thread
+    SETUP_ENGINE = os.getenv('SETUP_ENGINE', 'threads').lower()
+    ASYNC_SETUP_AWS_WORKERS = int(os.getenv('ASYNC_SETUP_AWS_WORKERS', '32'))  # threads for in-flight AWS calls
+
+    # Local AWS resource inventory (see aws_inventory.py); stored in TASK_DB_PATH
+    INVENTORY_ENABLED = os.getenv('INVENTORY_ENABLED', 'true').lower() == 'true'
+    INVENTORY_SYNC_INTERVAL = int(os.getenv('INVENTORY_SYNC_INTERVAL', '300'))
+    INVENTORY_MAX_AGE = int(os.getenv('INVENTORY_MAX_AGE', '900'))  # older inventories are not trusted
+
+    # Task status store (see task_store.py)
+    TASK_DB_PATH = os.getenv('TASK_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'state.sqlite3'))
+    TASK_FLUSH_INTERVAL = float(os.getenv('TASK_FLUSH_INTERVAL', '0.5'))
+    TASK_TTL = int(os.getenv('TASK_TTL', '86400'))
+    SSE_KEEPALIVE_INTERVAL = float(os.getenv('SSE_KEEPALIVE_INTERVAL', '2'))
+
     # Namecheap API configuration
     NAMECHEAP_API_USER = os.getenv('NAMECHEAP_API_USER')
     NAMECHEAP_API_KEY = os.getenv('NAMECHEAP_API_KEY')
-    NAMECHEAP_CLIENT_IP = os.getenv('NAMECHEAP_CLIENT_IP')
+    NAMECHEAP_CLIENT_IP = os.getenv('NAMECHEAP_CLIENT_IP')  # Skips ipify detection when set
+    NAMECHEAP_CLIENT_IP_TTL = int(os.getenv('NAMECHEAP_CLIENT_IP_TTL', '900'))
     NAMECHEAP_API_URL = os.getenv('NAMECHEAP_API_URL', 'https://api.namecheap.com/xml.response')
+    # Shared across all threads of a process (Namecheap allows 20/min and 700/hour per account)
+    NAMECHEAP_RATE_PER_MINUTE = int(os.getenv('NAMECHEAP_RATE_PER_MINUTE', '20'))
+    NAMECHEAP_RATE_PER_HOUR = int(os.getenv('NAMECHEAP_RATE_PER_HOUR', '700'))
+    NAMECHEAP_POOL_SIZE = int(os.getenv('NAMECHEAP_POOL_SIZE', '10'))
+    NAMECHEAP_MAX_RETRIES = int(os.getenv('NAMECHEAP_MAX_RETRIES', '4'))
+    NAMECHEAP_THROTTLE_ERROR_CODES = os.getenv('NAMECHEAP_THROTTLE_ERROR_CODES', '500000')
+    NAMECHEAP_HOSTS_CACHE_TTL = int(os.getenv('NAMECHEAP_HOSTS_CACHE_TTL', '30'))
     
     # Admin Credentials and Flask secret key
     FLASK_SECRET_KEY = os.getenv('FLASK_SECRET_KEY')
@@ -47,13 +117,15 @@ class Config:
             'name': 'Auto-insurance_AWS',
             'access_key_id': AWS_ACCESS_KEY_ID,
             'secret_access_key': AWS_SECRET_ACCESS_KEY,
-            'region': AWS_REGION
+            'region': AWS_REGION,
+            'cloudfront_pool': [i.strip() for i in CLOUDFRONT_POOL.split(',') if i.strip()]
         },
         'other-vertical': {
             'name': 'Other vertical AWS',
             'access_key_id': AWS_ACCESS_KEY_ID_OTHER,
             'secret_access_key': AWS_SECRET_ACCESS_KEY_OTHER,
-            'region': AWS_REGION_OTHER
+            'region': AWS_REGION_OTHER,
+            'cloudfront_pool': [i.strip() for i in CLOUDFRONT_POOL_OTHER.split(',') if i.strip()]
         }
     }
     
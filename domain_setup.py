@@ -0,0 +1,439 @@
+import time
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+import metrics
+from certificate_packs import CertificatePack
+from config import Config
+from step_graph import StepGraph
+
+StepFunction = Callable[[Dict], Awaitable[Dict]]
+
+
+def run_to_completion(coroutine: Awaitable):
+    """
+    Drive a coroutine that never suspends (every await it reaches is a
+    BlockingSetupEngine call) to completion on the current thread
+    """
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+    coroutine.close()
+    raise RuntimeError("A blocking setup step tried to suspend")
+
+
+class BlockingAdapter:
+    """Awaitable view of an object whose method calls run immediately on the calling thread"""
+
+    def __init__(self, target):
+        self._target = target
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        if not callable(attribute):
+            return attribute
+
+        async def call(*args, **kwargs):
+            return attribute(*args, **kwargs)
+        return call
+
+
+class BlockingSetupEngine:
+    """
+    DomainSetup engine of the threaded setups: every call blocks the step's
+    StepGraph thread. Operations not defined here are AWSAutomation methods.
+    """
+
+    def __init__(self, automation):
+        self.automation = automation
+        self.account_key = automation.account_key
+        self.aws = self.namecheap = BlockingAdapter(automation)
+
+    def __getattr__(self, name):
+        # request_certificate, setup_s3_buckets, wait_for_certificate_validation, ...
+        return getattr(self.aws, name)
+
+    async def blocking(self, func, *args, **kwargs):
+        return func(*args, **kwargs)
+
+    async def wait_for(self, kind: str, resource_id: str, timeout: float):
+        return self.automation.resource_watcher.wait(kind, resource_id, timeout=timeout)
+
+    async def run_once(self, pack: CertificatePack, phase, func: Callable[[], Awaitable]):
+        return pack.run_once(phase, lambda: run_to_completion(func()))
+
+    async def gather(self, *awaitables: Awaitable) -> List:
+        """One after the other; exceptions are returned in place, as asyncio.gather(return_exceptions=True)"""
+        results = []
+        for awaitable in awaitables:
+            try:
+                results.append(await awaitable)
+            except Exception as e:
+                results.append(e)
+        return results
+
+    async def run_graph(self, steps: List[Tuple[str, StepFunction, List[str]]]) -> Dict:
+        graph = StepGraph()
+        for key, func, depends_on in steps:
+            graph.add(key, lambda outputs, func=func: run_to_completion(func(outputs)), depends_on=depends_on)
+        return graph.run()
+
+
+class DomainSetup:
+    """
+    The steps of one setup_domain run, their dependency graph and checkpoint
+    handling, shared by both setup engines.
+
+    Step bodies are coroutine functions that reach AWS, Namecheap and the
+    checkpoint store only through `engine`: a BlockingSetupEngine, whose
+    calls never suspend so each step is driven to completion on a StepGraph
+    thread, or an AsyncAWSAutomation, whose calls run on executors and whose
+    waits are awaited on an AsyncStepGraph.
+    """
+
+    def __init__(self, engine, domain: str, progress_callback=None, checkpoints=None, resume: bool = False,
+                 certificate_pack: CertificatePack = None, validation_mode: str = None):
+        self.engine = engine
+        self.account_key = engine.account_key
+        self.domain = domain
+        self.progress_callback = progress_callback
+        self.checkpoints = checkpoints
+        self.resume = resume
+        self.certificate_pack = certificate_pack
+        self.validation_mode = validation_mode or Config.CERT_VALIDATION_MODE
+        self.route53_validation = self.validation_mode == 'route53'
+        self.result = {
+            'domain': domain,
+            'status': 'in_progress',
+            'steps': {},
+            'namecheap_updated': False,
+            'validation_mode': self.validation_mode
+        }
+        self.saved: Dict[str, Dict] = {}  # checkpoints of a previous attempt, when resuming
+
+    def report(self, message, step_key, step_status):
+        if self.progress_callback:
+            self.progress_callback(message, step_key, step_status)
+
+    def steps(self) -> List[Tuple[str, StepFunction, List[str]]]:
+        if self.route53_validation:
+            return [
+                # (key, function, dependencies): validation goes through the zone, delegated up front
+                ('route53_zone', self.route53_zone_step, []),
+                ('certificate', self.certificate_step, ['route53_zone']),
+                ('s3_buckets', self.s3_buckets_step, []),
+                ('nameserver_update', self.nameserver_update_step, ['route53_zone']),
+                ('certificate_validation', self.certificate_validation_step, ['certificate', 'nameserver_update']),
+                ('cloudfront', self.cloudfront_step, ['certificate_validation', 's3_buckets']),
+                ('route53_records', self.route53_records_step, ['cloudfront', 'route53_zone']),
+            ]
+        return [
+            # (key, function, dependencies)
+            ('certificate', self.certificate_step, []),
+            ('route53_zone', self.route53_zone_step, []),
+            ('s3_buckets', self.s3_buckets_step, []),
+            ('certificate_validation', self.certificate_validation_step, ['certificate']),
+            ('cloudfront', self.cloudfront_step, ['certificate_validation', 's3_buckets']),
+            ('route53_records', self.route53_records_step, ['cloudfront', 'route53_zone']),
+            ('nameserver_update', self.nameserver_update_step, ['route53_records']),
+        ]
+
+    # Steps
+
+    # Step 1: Request SSL Certificate
+    async def certificate_step(self, outputs):
+        domain, engine, pack = self.domain, self.engine, self.certificate_pack
+        self.report('Setting up SSL certificate...', 'certificate', 'in_progress')
+        if pack is not None:
+            packed = (await engine.run_once(pack, 'certificate', self._request_packed_certificate))[domain]
+            cert_arn, validation_records = packed['certificate_arn'], packed['validation_records']
+        elif await self._pending_checkpoint_certificate():
+            # A previous attempt requested the certificate but never wrote its CNAMEs: write them now
+            previous = self.saved['certificate']
+            cert_arn, validation_records = previous['certificate_arn'], previous['validation_records']
+            print(f"Reusing pending certificate {cert_arn} from the previous attempt")
+        else:
+            cert_arn, validation_records = await engine.request_certificate(domain)
+        step = {
+            'status': 'completed',
+            'certificate_arn': cert_arn,
+            'validation_records': validation_records
+        }
+
+        if validation_records and self.route53_validation and pack is not None:
+            # The records of the whole pack were written to Route 53 with the request
+            step['validation_change_id'] = packed.get('validation_change_id')
+            self.report('Shared SSL certificate requested - validation records added to Route 53', 'certificate', 'completed')
+        elif validation_records and self.route53_validation:
+            self.report('Adding validation records to Route 53...', 'certificate', 'in_progress')
+            step['validation_change_id'] = await engine.aws.upsert_validation_records(
+                outputs['route53_zone']['zone_id'], domain, validation_records
+            )
+            self.report('SSL certificate requested - validation records added to Route 53', 'certificate', 'completed')
+        elif validation_records and pack is not None:
+            # The CNAMEs of the whole pack were pushed with the request
+            step['namecheap_cname_updated'] = packed['namecheap_cname_updated']
+            self.result['namecheap_cname_updated'] = packed['namecheap_cname_updated']
+            if packed['namecheap_cname_updated']:
+                self.report('Shared SSL certificate requested - CNAME records added automatically', 'certificate', 'completed')
+            else:
+                self.report('Shared SSL certificate requested - manual CNAME update required', 'certificate', 'completed')
+        # IMMEDIATELY add CNAME records to Namecheap if new certificate
+        elif validation_records:
+            self.report('Adding CNAME records to Namecheap...', 'certificate', 'in_progress')
+
+            print(f"\n=== Adding CNAME records for {domain} ===")
+            print(f"Number of validation records: {len(validation_records)}")
+
+            namecheap_cname_success = await engine.namecheap.add_namecheap_cname_records(domain, validation_records)
+            step['namecheap_cname_updated'] = namecheap_cname_success
+            self.result['namecheap_cname_updated'] = namecheap_cname_success
+
+            if namecheap_cname_success:
+                self.report('SSL certificate requested - CNAME records added automatically', 'certificate', 'completed')
+                print("CNAME records added successfully, propagation is checked before validation polling")
+            else:
+                self.report('SSL certificate requested - manual CNAME update required', 'certificate', 'completed')
+                print("Failed to add CNAME records automatically")
+        else:
+            self.report('Using existing SSL certificate', 'certificate', 'completed')
+        return step
+
+    async def _request_packed_certificate(self) -> Dict[str, Dict]:
+        if not self.route53_validation:
+            return await self.engine.request_packed_certificate(self.certificate_pack)
+        zones = await self._pack_zones()
+        zone_ids = {member: zone[0] for member, zone in zones.items() if not isinstance(zone, Exception)}
+        return await self.engine.request_packed_certificate(self.certificate_pack, route53_zone_ids=zone_ids)
+
+    async def _pending_checkpoint_certificate(self) -> bool:
+        """Whether the checkpointed certificate of a previous attempt is still waiting for its CNAMEs"""
+        previous = self.saved.get('certificate')
+        if not previous or not previous.get('validation_records'):
+            return False
+        return await self.engine.aws.certificate_status(previous['certificate_arn']) == 'PENDING_VALIDATION'
+
+    # Step 2: Create Route 53 Hosted Zone (but don't update nameservers yet)
+    async def route53_zone_step(self, outputs):
+        self.report('Setting up Route 53 hosted zone...', 'route53_zone', 'in_progress')
+        if self.route53_validation and self.certificate_pack is not None:
+            zone_id, nameservers, is_existing = self._pack_member_result(await self._pack_zones())
+        else:
+            zone_id, nameservers, is_existing = await self.engine.aws.create_hosted_zone(self.domain)
+
+        if is_existing:
+            self.report('Using existing Route 53 hosted zone', 'route53_zone', 'completed')
+        else:
+            self.report('Route 53 hosted zone created', 'route53_zone', 'completed')
+        return {
+            'status': 'completed',
+            'zone_id': zone_id,
+            'nameservers': nameservers
+        }
+
+    # Step 3: Create S3 Buckets
+    async def s3_buckets_step(self, outputs):
+        self.report('Setting up S3 buckets...', 's3_buckets', 'in_progress')
+        s3_endpoint = await self.engine.setup_s3_buckets(self.domain)
+        self.report('S3 buckets configured', 's3_buckets', 'completed')
+        return {
+            'status': 'completed',
+            's3_endpoint': s3_endpoint
+        }
+
+    # Step 4: Wait for certificate validation (only if new certificate)
+    async def certificate_validation_step(self, outputs):
+        engine, pack = self.engine, self.certificate_pack
+        cert_arn = outputs['certificate']['certificate_arn']
+        validation_records = outputs['certificate']['validation_records']
+        if validation_records:
+            change_id = outputs['certificate'].get('validation_change_id')
+            if change_id:
+                self.report('Waiting for Route 53 validation records to propagate...', 'certificate_validation', 'in_progress')
+                try:
+                    await engine.wait_for('change', change_id, timeout=Config.ROUTE53_CHANGE_TIMEOUT)
+                except TimeoutError:
+                    print(f"Route 53 change {change_id} not INSYNC yet, polling ACM anyway")
+            self.report('Waiting for certificate validation...', 'certificate_validation', 'in_progress')
+            if pack is not None:
+                # One waiter per shared certificate, whichever pack member gets here first
+                await engine.run_once(
+                    pack, ('certificate_validation', cert_arn),
+                    lambda: engine.wait_for_certificate_validation(cert_arn, validation_records=validation_records)
+                )
+            else:
+                await engine.wait_for_certificate_validation(cert_arn, validation_records=validation_records)
+            self.report('Certificate validated', 'certificate_validation', 'completed')
+        else:
+            self.report('Certificate already validated', 'certificate_validation', 'completed')
+        return {
+            'status': 'completed'
+        }
+
+    # Step 5: Create CloudFront Distribution
+    async def cloudfront_step(self, outputs):
+        cert_arn = outputs['certificate']['certificate_arn']
+        s3_endpoint = outputs['s3_buckets']['s3_endpoint']
+        self.report('Setting up CloudFront distribution...', 'cloudfront', 'in_progress')
+        cf_distribution_id, cf_domain, is_existing = await self.engine.aws.create_cloudfront_distribution(
+            self.domain, s3_endpoint, cert_arn
+        )
+
+        if not is_existing:
+            # Deployment only matters to visitors; the watcher follows it off the critical path
+            await self.engine.aws.track_distribution_deployment(cf_distribution_id)
+
+        if is_existing:
+            self.report('Using existing CloudFront distribution', 'cloudfront', 'completed')
+        else:
+            self.report('CloudFront distribution created', 'cloudfront', 'completed')
+        return {
+            'status': 'completed',
+            'distribution_id': cf_distribution_id,
+            'distribution_domain': cf_domain
+        }
+
+    # Step 6: Create Route 53 Records (ALIAS records - no IP needed!)
+    async def route53_records_step(self, outputs):
+        zone_id = outputs['route53_zone']['zone_id']
+        cf_distribution_id = outputs['cloudfront']['distribution_id']
+        self.report('Creating Route 53 alias records...', 'route53_records', 'in_progress')
+        await self.engine.aws.create_route53_records(zone_id, self.domain, cf_distribution_id)
+        self.report('Route 53 alias records created', 'route53_records', 'completed')
+        return {
+            'status': 'completed'
+        }
+
+    # Step 7: Update Namecheap nameservers (AFTER certificate is validated)
+    async def nameserver_update_step(self, outputs):
+        domain = self.domain
+        nameservers = outputs['route53_zone']['nameservers']
+        self.report('Updating Namecheap nameservers...', 'nameserver_update', 'in_progress')
+
+        print(f"\n=== Updating nameservers for {domain} ===")
+        print(f"Nameservers to set: {nameservers}")
+
+        if self.route53_validation and self.certificate_pack is not None:
+            namecheap_ns_success = self._pack_member_result(await self._pack_nameserver_updates())
+        else:
+            namecheap_ns_success = await self.engine.namecheap.update_namecheap_nameservers(domain, nameservers)
+        self.result['namecheap_ns_updated'] = namecheap_ns_success
+
+        if not namecheap_ns_success and self.route53_validation:
+            # The validation CNAMEs only exist in Route 53: without delegation the certificate never validates
+            raise Exception(f"Could not delegate {domain} to Route 53, which route53 validation mode requires")
+        if namecheap_ns_success:
+            self.report('Nameservers updated automatically in Namecheap', 'nameserver_update', 'completed')
+            print("Nameservers updated successfully")
+        else:
+            self.report('Manual nameserver update required in Namecheap', 'nameserver_update', 'completed')
+            print("Failed to update nameservers automatically")
+        return {
+            'status': 'completed',
+            'namecheap_updated': namecheap_ns_success
+        }
+
+    # Route 53 validation of a certificate pack
+    #
+    # The shared certificate only validates once every member's CNAMEs are in its
+    # delegated zone, while members queued behind SETUP_MAX_CONCURRENCY_PER_ACCOUNT
+    # have not started: the first member to reach each phase does it for the pack.
+
+    async def _for_pack(self, phase: str, func: Callable[[str], Awaitable]) -> Dict[str, object]:
+        """domain -> func(domain) (or the exception it raised) for every pack member, run once per pack"""
+        engine, pack = self.engine, self.certificate_pack
+
+        async def run_for_pack():
+            return dict(zip(pack.domains, await engine.gather(*(func(member) for member in pack.domains))))
+        return await engine.run_once(pack, phase, run_for_pack)
+
+    def _pack_member_result(self, results: Dict[str, object]):
+        result = results[self.domain]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def _pack_zones(self) -> Dict[str, object]:
+        return await self._for_pack('route53_zone', self.engine.aws.create_hosted_zone)
+
+    async def _pack_nameserver_updates(self) -> Dict[str, object]:
+        zones = await self._pack_zones()
+
+        async def delegate(member):
+            zone = zones[member]
+            if isinstance(zone, Exception):
+                raise zone
+            return await self.engine.namecheap.update_namecheap_nameservers(member, zone[1])
+        return await self._for_pack('nameserver_update', delegate)
+
+    # Running
+
+    async def run(self) -> Dict:
+        domain, engine, result, checkpoints = self.domain, self.engine, self.result, self.checkpoints
+        steps = self.steps()
+
+        if checkpoints is not None and self.resume:
+            self.saved = await engine.blocking(checkpoints.load, self.account_key, domain)
+        saved = self.saved
+        resumed = set()    # restored from a checkpoint
+        unchanged = set()  # restored, or re-run with the same outputs as the checkpoint
+
+        def run_step(key, func, depends_on):
+            async def run(outputs):
+                checkpoint = saved.get(key)
+                if checkpoint is not None and all(dep in unchanged for dep in depends_on):
+                    if await engine.aws.verify_checkpoint(domain, key, checkpoint, outputs,
+                                                          validation_mode=self.validation_mode):
+                        resumed.add(key)
+                        unchanged.add(key)
+                        result['steps'][key] = checkpoint
+                        self.report(f'Resumed from checkpoint ({key})', key, 'completed')
+                        return checkpoint
+                    print(f"Checkpoint for {domain}/{key} failed verification, re-running step")
+
+                started_at = time.monotonic()
+                try:
+                    step = await func(outputs)
+                except Exception:
+                    metrics.SETUP_STEP_DURATION.labels(key, 'failed').observe(time.monotonic() - started_at)
+                    raise
+                metrics.SETUP_STEP_DURATION.labels(key, 'completed').observe(time.monotonic() - started_at)
+                result['steps'][key] = step
+                if checkpoint == step:
+                    unchanged.add(key)
+                if checkpoints is not None:
+                    await engine.blocking(checkpoints.save, self.account_key, domain, key, step)
+                return step
+            return run
+
+        setup_started_at = time.monotonic()
+        try:
+            print(f"\n🚀 Starting domain setup for: {domain}")
+            print("ℹ️  This process uses CloudFront + Route 53 - NO IP ADDRESS REQUIRED!")
+
+            await engine.run_graph([(key, run_step(key, func, depends_on), depends_on)
+                                    for key, func, depends_on in steps])
+
+            if resumed:
+                result['resumed_steps'] = [key for key, _, _ in steps if key in resumed]
+            if 'certificate' in resumed and 'namecheap_cname_updated' in result['steps']['certificate']:
+                result['namecheap_cname_updated'] = result['steps']['certificate']['namecheap_cname_updated']
+            if 'nameserver_update' in resumed:
+                result['namecheap_ns_updated'] = result['steps']['nameserver_update'].get('namecheap_updated', False)
+
+            result['status'] = 'completed'
+            metrics.SETUP_DURATION.labels(self.account_key, 'completed').observe(time.monotonic() - setup_started_at)
+
+            print(f"\n✅ Domain setup completed for {domain}!")
+            print(f"🌐 Your domain will be accessible via CloudFront CDN")
+            print(f"🔒 SSL certificate automatically handles HTTPS")
+            print(f"⚡ Global edge locations provide fast performance")
+            print(f"📍 No IP addresses to manage - all handled by AWS!")
+
+            return result
+
+        except Exception as e:
+            result['status'] = 'failed'
+            result['error'] = str(e)
+            metrics.SETUP_DURATION.labels(self.account_key, 'failed').observe(time.monotonic() - setup_started_at)
+            return result
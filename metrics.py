@@ -0,0 +1,135 @@
+import os
+import time
+from typing import Tuple
+
+from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+                               generate_latest, multiprocess)
+
+import api_accounting
+
+# Error codes botocore's standard retry mode treats as throttling
+AWS_THROTTLE_ERROR_CODES = frozenset([
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'RequestThrottledException',
+    'TooManyRequestsException', 'ProvisionedThroughputExceededException', 'TransactionInProgressException',
+    'RequestLimitExceeded', 'BandwidthLimitExceeded', 'LimitExceededException', 'RequestThrottled',
+    'SlowDown', 'PriorRequestNotComplete', 'EC2ThrottledException',
+])
+
+# Provisioning steps range from sub-second API calls to 30-minute certificate validations
+STEP_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800)
+API_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+SETUP_STEP_DURATION = Histogram(
+    'domain_setup_step_duration_seconds', 'Duration of each setup_domain step',
+    ['step', 'outcome'], buckets=STEP_BUCKETS
+)
+SETUP_DURATION = Histogram(
+    'domain_setup_duration_seconds', 'Duration of a whole setup_domain run',
+    ['account', 'outcome'], buckets=STEP_BUCKETS
+)
+SETUP_QUEUE_DEPTH = Gauge(
+    'domain_setup_queue_depth', 'Domain setup tasks waiting in the scheduler queue',
+    ['account'], multiprocess_mode='livesum'
+)
+SETUP_RUNNING = Gauge(
+    'domain_setup_running_tasks', 'Domain setup tasks currently running',
+    ['account'], multiprocess_mode='livesum'
+)
+
+AWS_API_DURATION = Histogram(
+    'aws_api_call_duration_seconds', 'Latency of AWS API calls including SDK retries',
+    ['service', 'operation', 'outcome'], buckets=API_BUCKETS
+)
+AWS_API_RETRIES = Counter(
+    'aws_api_retries_total', 'AWS API attempts retried by the SDK', ['service', 'operation']
+)
+AWS_API_THROTTLES = Counter(
+    'aws_api_throttles_total', 'AWS API attempts rejected with a throttling error', ['service', 'operation']
+)
+
+NAMECHEAP_API_DURATION = Histogram(
+    'namecheap_api_call_duration_seconds', 'Latency of single Namecheap API attempts',
+    ['command', 'outcome'], buckets=API_BUCKETS
+)
+NAMECHEAP_API_RETRIES = Counter(
+    'namecheap_api_retries_total', 'Namecheap API attempts retried', ['command', 'reason']
+)
+NAMECHEAP_API_THROTTLES = Counter(
+    'namecheap_api_throttles_total', 'Namecheap API attempts rejected as throttled', ['command']
+)
+NAMECHEAP_RATE_LIMIT_WAIT = Histogram(
+    'namecheap_rate_limit_wait_seconds', 'Time spent waiting on the local Namecheap rate limiter',
+    buckets=API_BUCKETS + (60, 120, 300)
+)
+
+
+def _labels(model) -> Tuple[str, str]:
+    return model.service_model.service_id.hyphenize(), model.name
+
+
+# One hook set per client feeds both the Prometheus metrics and the current task's API call counter
+
+def _before_call(model, context, **kwargs):
+    context['metrics_started_at'] = time.monotonic()
+    context['metrics_model'] = model
+    api_accounting.record(_labels(model)[0], 'calls')
+
+
+def _after_call(http_response, parsed, model, context, **kwargs):
+    started_at = context.get('metrics_started_at')
+    service, operation = _labels(model)
+    failed = http_response.status_code >= 300
+    if started_at is not None:
+        AWS_API_DURATION.labels(service, operation, 'error' if failed else 'ok').observe(time.monotonic() - started_at)
+    retries = parsed.get('ResponseMetadata', {}).get('RetryAttempts', 0)
+    if retries:
+        AWS_API_RETRIES.labels(service, operation).inc(retries)
+        api_accounting.record(service, 'retries', retries)
+    if failed:
+        api_accounting.record(service, 'errors')
+
+
+def _after_call_error(context, **kwargs):
+    started_at = context.get('metrics_started_at')
+    model = context.get('metrics_model')
+    if model is None:
+        return
+    service, operation = _labels(model)
+    if started_at is not None:
+        AWS_API_DURATION.labels(service, operation, 'exception').observe(time.monotonic() - started_at)
+    api_accounting.record(service, 'errors')
+
+
+def _needs_retry(response, operation, **kwargs):
+    # Called once per attempt, before the retry handler decides
+    if response is None:
+        return None
+    http_response, parsed = response
+    if http_response.status_code == 429 or parsed.get('Error', {}).get('Code') in AWS_THROTTLE_ERROR_CODES:
+        service, operation_name = _labels(operation)
+        AWS_API_THROTTLES.labels(service, operation_name).inc()
+        api_accounting.record(service, 'throttles')
+    return None
+
+
+def instrument_client(client):
+    """
+    Record latency, retries and throttles of every call made through a boto3
+    client, and attribute the call to the current task's counter
+    """
+    events = client.meta.events
+    events.register('before-call', _before_call)
+    events.register('after-call', _after_call)
+    events.register('after-call-error', _after_call_error)
+    events.register('needs-retry', _needs_retry)
+    return client
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Exposition payload and content type; aggregates all workers when PROMETHEUS_MULTIPROC_DIR is set"""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
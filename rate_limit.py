@@ -0,0 +1,66 @@
+import threading
+import time
+from typing import Iterable
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per `per` seconds, bursting up to
+    `capacity`. acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate: float, per: float = 1.0, capacity: float = None):
+        self.fill_rate = rate / per
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        # Caller must hold self._lock
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.fill_rate)
+        self._updated_at = now
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """Take tokens if available; otherwise return the seconds to wait (0 on success)"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.fill_rate
+
+    def acquire(self, tokens: float = 1, timeout: float = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def drain(self):
+        """Empty the bucket, e.g. after the remote side reported throttling"""
+        with self._lock:
+            self._refill()
+            self._tokens = 0.0
+
+
+class RateLimiter:
+    """All of several buckets must grant a token (e.g. per-minute and per-hour limits)"""
+
+    def __init__(self, buckets: Iterable[TokenBucket]):
+        self.buckets = list(buckets)
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        # Serialize so a caller never holds a token from one bucket while waiting on another
+        with self._lock:
+            for bucket in self.buckets:
+                bucket.acquire()
+
+    def drain(self):
+        for bucket in self.buckets:
+            bucket.drain()
@@ -0,0 +1,193 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeout
+from typing import Dict, Iterable, List, Tuple
+
+from botocore.exceptions import ClientError
+
+from aws_clients import get_client
+from config import Config
+
+KINDS = ('certificate', 'distribution', 'change')
+
+
+class ResourceWatcher:
+    """
+    One background poller per account for the resources setups wait on:
+    ACM certificates until ISSUED, CloudFront distributions until Deployed and
+    Route 53 changes until INSYNC.
+
+    Tasks register what they wait on and block on (or await) a future; every
+    `interval` the watcher checks all registered resources of a kind at once.
+    Certificates cost one list_certificates(PENDING_VALIDATION) listing per
+    round, plus a describe only for certificates that left that list;
+    distributions one list_distributions listing. Route 53 has no batch
+    status call, so each pending change is one get_change per round, shared
+    by all its waiters.
+    """
+
+    def __init__(self, account_key: str, interval: float = None):
+        self.account_key = account_key
+        self.interval = interval if interval is not None else Config.RESOURCE_WATCHER_INTERVAL
+        self._watches: Dict[str, Dict[str, List[Future]]] = {kind: {} for kind in KINDS}
+        # Watches nobody blocks on give up by themselves after their timeout
+        self._deadlines: Dict[Future, Tuple[str, str, float]] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread_pid = None
+
+    # Registration
+
+    def watch(self, kind: str, resource_id: str, timeout: float = None) -> Future:
+        """
+        A future resolved with the resource's details once it reaches its target state.
+        With a timeout the watcher itself fails the future with TimeoutError when it
+        runs out, for callers that attach a callback instead of waiting.
+        """
+        future = Future()
+        with self._lock:
+            self._watches[kind].setdefault(resource_id, []).append(future)
+            if timeout is not None:
+                self._deadlines[future] = (kind, resource_id, time.monotonic() + timeout)
+            # Threads do not survive a fork, so each worker process starts its own poller
+            if self._thread_pid != os.getpid():
+                self._thread_pid = os.getpid()
+                threading.Thread(target=self._run, daemon=True,
+                                 name=f'resource-watcher-{self.account_key}').start()
+            self._wakeup.set()
+        return future
+
+    def unwatch(self, kind: str, resource_id: str, future: Future):
+        with self._lock:
+            futures = self._watches[kind].get(resource_id, [])
+            if future in futures:
+                futures.remove(future)
+            if not futures:
+                self._watches[kind].pop(resource_id, None)
+
+    def wait(self, kind: str, resource_id: str, timeout: float = None):
+        future = self.watch(kind, resource_id)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            self.unwatch(kind, resource_id, future)
+            raise TimeoutError(f"Timed out after {timeout} seconds waiting for {kind} {resource_id}")
+
+    async def wait_async(self, kind: str, resource_id: str, timeout: float = None):
+        future = self.watch(kind, resource_id)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            self.unwatch(kind, resource_id, future)
+            raise TimeoutError(f"Timed out after {timeout} seconds waiting for {kind} {resource_id}")
+
+    def _expire(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [(future, kind, resource_id) for future, (kind, resource_id, deadline) in self._deadlines.items()
+                       if future.done() or deadline <= now]
+            for future, _, _ in expired:
+                del self._deadlines[future]
+        for future, kind, resource_id in expired:
+            if future.done():
+                continue
+            self.unwatch(kind, resource_id, future)
+            try:
+                future.set_exception(TimeoutError(f"Stopped watching {kind} {resource_id} after its timeout"))
+            except InvalidStateError:
+                pass  # resolved by a poll in the meantime
+
+    def _resolve(self, kind: str, resource_id: str, value=None, error: Exception = None):
+        with self._lock:
+            futures = self._watches[kind].pop(resource_id, [])
+        for future in futures:
+            try:
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(value)
+            except InvalidStateError:
+                pass  # cancelled by an asyncio waiter that timed out
+
+    # Polling
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            time.sleep(self.interval)
+            with self._lock:
+                watched = {kind: list(ids) for kind, ids in self._watches.items() if ids}
+                if not watched:
+                    self._wakeup.clear()
+                    continue
+            for kind, resource_ids in watched.items():
+                try:
+                    getattr(self, f'_poll_{kind}s')(resource_ids)
+                except Exception as e:
+                    print(f"❌ Resource watcher for {self.account_key} could not poll {kind}s: {e}")
+            self._expire()
+
+    def _poll_certificates(self, arns: Iterable[str]):
+        acm = get_client(self.account_key, 'acm', 'us-east-1')
+        pending = set()
+        paginator = acm.get_paginator('list_certificates')
+        for page in paginator.paginate(CertificateStatuses=['PENDING_VALIDATION']):
+            pending.update(summary['CertificateArn'] for summary in page['CertificateSummaryList'])
+
+        for arn in arns:
+            if arn in pending:
+                continue
+            # Left PENDING_VALIDATION: one describe to learn how
+            try:
+                certificate = acm.describe_certificate(CertificateArn=arn)['Certificate']
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') == 'ResourceNotFoundException':
+                    self._resolve('certificate', arn, error=Exception(f"Certificate {arn} no longer exists"))
+                else:
+                    print(f"❌ Resource watcher could not describe {arn}: {e}")
+                continue
+            status = certificate['Status']
+            if status == 'ISSUED':
+                self._resolve('certificate', arn, certificate)
+            elif status == 'FAILED':
+                self._resolve('certificate', arn, error=Exception("Certificate validation failed"))
+            elif status != 'PENDING_VALIDATION':
+                self._resolve('certificate', arn, error=Exception(f"Certificate validation ended with status {status}"))
+
+    def _poll_distributions(self, distribution_ids: Iterable[str]):
+        cloudfront = get_client(self.account_key, 'cloudfront')
+        statuses = {}
+        paginator = cloudfront.get_paginator('list_distributions')
+        for page in paginator.paginate():
+            for distribution in page['DistributionList'].get('Items', []):
+                statuses[distribution['Id']] = distribution
+
+        for distribution_id in distribution_ids:
+            distribution = statuses.get(distribution_id)
+            if distribution is None:
+                self._resolve('distribution', distribution_id,
+                              error=Exception(f"CloudFront distribution {distribution_id} no longer exists"))
+            elif distribution['Status'] == 'Deployed':
+                self._resolve('distribution', distribution_id, distribution)
+
+    def _poll_changes(self, change_ids: Iterable[str]):
+        route53 = get_client(self.account_key, 'route53')
+        for change_id in change_ids:
+            change = route53.get_change(Id=change_id)['ChangeInfo']
+            if change['Status'] == 'INSYNC':
+                self._resolve('change', change_id, change)
+
+
+_watchers: Dict[str, ResourceWatcher] = {}
+_watchers_lock = threading.Lock()
+
+
+def get_resource_watcher(account_key: str) -> ResourceWatcher:
+    """The account's shared watcher, created on first use"""
+    with _watchers_lock:
+        watcher = _watchers.get(account_key)
+        if watcher is None:
+            watcher = _watchers[account_key] = ResourceWatcher(account_key)
+        return watcher
@@ -0,0 +1,107 @@
+import asyncio
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List
+
+
+class StepGraph:
+    """
+    Dependency graph of named steps.
+
+    Every step starts as soon as all the steps it depends on have finished, so
+    independent steps run concurrently and the total run time follows the
+    critical path. A step function receives a dict with the return values of
+    the steps completed so far. Steps run in a copy of the caller's context,
+    so context variables (e.g. the task's API call counter) carry over.
+    """
+
+    def __init__(self, max_workers: int = None):
+        self.max_workers = max_workers
+        self._steps: Dict[str, Callable[[Dict], object]] = {}
+        self._depends_on: Dict[str, List[str]] = {}
+
+    def add(self, key: str, func: Callable[[Dict], object], depends_on: Iterable[str] = ()):
+        if key in self._steps:
+            raise ValueError(f"Duplicate step: {key}")
+        depends_on = list(depends_on)
+        for dependency in depends_on:
+            if dependency not in self._steps:
+                raise ValueError(f"Step {key} depends on unknown step {dependency}")
+        self._steps[key] = func
+        self._depends_on[key] = depends_on
+        return self
+
+    def run(self) -> Dict[str, object]:
+        """
+        Run all steps and return their outputs keyed by step.
+
+        On the first failure no further steps are started; steps already running
+        are allowed to finish and the original exception is re-raised.
+        """
+        outputs: Dict[str, object] = {}
+        pending = dict(self._depends_on)
+        running = {}
+        error = None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers or max(len(self._steps), 1)) as executor:
+            while pending or running:
+                if error is None:
+                    ready = [key for key, deps in pending.items() if all(dep in outputs for dep in deps)]
+                    for key in ready:
+                        del pending[key]
+                        context = contextvars.copy_context()
+                        running[executor.submit(context.run, self._steps[key], dict(outputs))] = key
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = running.pop(future)
+                    try:
+                        outputs[key] = future.result()
+                    except Exception as e:
+                        if error is None:
+                            error = e
+
+        if error is not None:
+            raise error
+        return outputs
+
+
+class AsyncStepGraph(StepGraph):
+    """
+    StepGraph whose steps are coroutine functions, run as asyncio tasks.
+
+    Same scheduling and failure semantics as StepGraph.run; each task gets a
+    copy of the caller's context, as asyncio always does.
+    """
+
+    async def run(self) -> Dict[str, object]:
+        outputs: Dict[str, object] = {}
+        pending = dict(self._depends_on)
+        running = {}
+        error = None
+
+        while pending or running:
+            if error is None:
+                ready = [key for key, deps in pending.items() if all(dep in outputs for dep in deps)]
+                for key in ready:
+                    del pending[key]
+                    running[asyncio.ensure_future(self._steps[key](dict(outputs)))] = key
+
+            if not running:
+                break
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                key = running.pop(task)
+                try:
+                    outputs[key] = task.result()
+                except Exception as e:
+                    if error is None:
+                        error = e
+
+        if error is not None:
+            raise error
+        return outputs
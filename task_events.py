@@ -0,0 +1,51 @@
+import json
+import queue
+import threading
+from typing import Dict, Iterable, List
+
+
+class TaskSubscription:
+    def __init__(self, task_ids: Iterable[str]):
+        self.task_ids = set(task_ids)
+        self.events = queue.Queue()
+
+    def get(self, timeout: float = None) -> Dict:
+        """Next event for one of the subscribed tasks; raises queue.Empty on timeout"""
+        return self.events.get(timeout=timeout)
+
+
+class TaskEventBus:
+    """
+    In-process publish/subscribe for task progress events.
+
+    Setup threads publish every progress_callback update; each Server-Sent
+    Events connection holds one subscription covering all the task ids it
+    streams.
+    """
+
+    def __init__(self):
+        self._subscriptions: List[TaskSubscription] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, task_ids: Iterable[str]) -> TaskSubscription:
+        subscription = TaskSubscription(task_ids)
+        with self._lock:
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: TaskSubscription):
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def publish(self, task_id: str, event: Dict):
+        event = dict(event, task_id=task_id)
+        with self._lock:
+            subscriptions = [s for s in self._subscriptions if task_id in s.task_ids]
+        for subscription in subscriptions:
+            subscription.events.put(event)
+
+
+def format_sse(event_type: str, data: Dict) -> str:
+    """Serialize one Server-Sent Events message"""
+    return f"event: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
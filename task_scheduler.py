@@ -0,0 +1,141 @@
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+import metrics
+
+
+class TaskCancelled(Exception):
+    """Raised inside a running task once its cancellation was requested"""
+
+
+class ScheduledTask:
+    def __init__(self, task_id: str, account_key: str, func: Callable[[threading.Event], None]):
+        self.task_id = task_id
+        self.account_key = account_key
+        self.func = func
+        self.cancel_event = threading.Event()
+        self.state = 'queued'  # queued -> running -> done, or cancelled
+
+
+class DomainTaskScheduler:
+    """
+    Bounded FIFO scheduler for domain setup tasks.
+
+    At most `max_concurrency` tasks run at once and at most `max_per_account` of
+    them against the same AWS account. Waiting tasks keep their submission
+    order; a task whose account is saturated does not block tasks for other
+    accounts queued behind it.
+    """
+
+    def __init__(self, max_concurrency: int, max_per_account: int):
+        self.max_concurrency = max_concurrency
+        self.max_per_account = max_per_account
+        self._pending = deque()
+        self._tasks: Dict[str, ScheduledTask] = {}
+        self._running = 0
+        self._running_per_account = defaultdict(int)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='domain-setup')
+
+    def submit(self, task_id: str, account_key: str, func: Callable[[threading.Event], None]) -> Optional[int]:
+        """
+        Queue a task. `func` receives the task's cancel event. If it returns a
+        Future (e.g. a setup handed to the asyncio engine) the task keeps its
+        slot until that future is done, without holding a scheduler thread.
+
+        Returns the 1-based queue position, or None if the task started immediately.
+        """
+        task = ScheduledTask(task_id, account_key, func)
+        with self._lock:
+            self._tasks[task_id] = task
+            self._pending.append(task)
+            self._dispatch()
+            return self._position(task_id)
+
+    def position(self, task_id: str) -> Optional[int]:
+        """1-based position among queued tasks, or None if not queued"""
+        with self._lock:
+            return self._position(task_id)
+
+    def _position(self, task_id: str) -> Optional[int]:
+        for index, task in enumerate(self._pending, 1):
+            if task.task_id == task_id:
+                return index
+        return None
+
+    def queue_depth(self, account_key: str = None) -> int:
+        with self._lock:
+            if account_key is None:
+                return len(self._pending)
+            return sum(1 for task in self._pending if task.account_key == account_key)
+
+    def cancel(self, task_id: str) -> Optional[str]:
+        """
+        Cancel a task. Queued tasks are dropped; running tasks get their cancel
+        event set and stop at their next progress update.
+
+        Returns the state the task was in, or None if the task is unknown here.
+        """
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                return None
+            previous_state = task.state
+            if task.state == 'queued':
+                self._pending.remove(task)
+                task.state = 'cancelled'
+                del self._tasks[task_id]
+                self._publish_metrics()
+            task.cancel_event.set()
+            return previous_state
+
+    def is_cancelled(self, task_id: str) -> bool:
+        with self._lock:
+            task = self._tasks.get(task_id)
+            return task is not None and task.cancel_event.is_set()
+
+    def _dispatch(self):
+        # Caller must hold self._lock
+        for task in list(self._pending):
+            if self._running >= self.max_concurrency:
+                break
+            if self._running_per_account[task.account_key] >= self.max_per_account:
+                continue
+            self._pending.remove(task)
+            task.state = 'running'
+            self._running += 1
+            self._running_per_account[task.account_key] += 1
+            self._executor.submit(self._run, task)
+        self._publish_metrics()
+
+    def _publish_metrics(self):
+        # Caller must hold self._lock
+        queued = defaultdict(int)
+        for task in self._pending:
+            queued[task.account_key] += 1
+        for account_key in set(queued) | set(self._running_per_account):
+            metrics.SETUP_QUEUE_DEPTH.labels(account_key).set(queued[account_key])
+            metrics.SETUP_RUNNING.labels(account_key).set(self._running_per_account[account_key])
+
+    def _run(self, task: ScheduledTask):
+        try:
+            outcome = task.func(task.cancel_event)
+        except Exception as e:
+            print(f"❌ Task {task.task_id} crashed: {e}")
+            outcome = None
+        if isinstance(outcome, Future):
+            outcome.add_done_callback(lambda future: self._finish(task, future))
+        else:
+            self._finish(task)
+
+    def _finish(self, task: ScheduledTask, future: Future = None):
+        if future is not None and not future.cancelled() and future.exception() is not None:
+            print(f"❌ Task {task.task_id} crashed: {future.exception()}")
+        with self._lock:
+            task.state = 'done'
+            self._tasks.pop(task.task_id, None)
+            self._running -= 1
+            self._running_per_account[task.account_key] -= 1
+            self._dispatch()
@@ -0,0 +1,255 @@
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from config import Config
+
+FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+
+
+class SQLiteStore:
+    """Base for stores sharing the state database: schema setup and per-thread connections"""
+
+    SCHEMA = ''
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread, reopened after a fork (gunicorn preload)
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+
+class TaskStore(SQLiteStore):
+    """
+    Domain task status documents persisted in SQLite.
+
+    The database runs in WAL mode so every gunicorn worker can read while
+    another one writes. Tasks running in this process are also kept in memory:
+    progress updates only mark them dirty, and a background thread writes all
+    dirty documents in one transaction every `flush_interval` seconds. Creation
+    and final results are written immediately. Finished tasks are deleted once
+    they are older than `ttl` seconds.
+    """
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS domain_tasks (
+            task_id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            document TEXT NOT NULL,
+            finished INTEGER NOT NULL DEFAULT 0,
+            cancel_requested INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_domain_tasks_finished_updated
+            ON domain_tasks (finished, updated_at);
+    '''
+
+    def __init__(self, path: str, flush_interval: float = None, ttl: int = None):
+        self.flush_interval = flush_interval if flush_interval is not None else Config.TASK_FLUSH_INTERVAL
+        self.ttl = ttl if ttl is not None else Config.TASK_TTL
+        self.on_cancel_requested: Optional[Callable[[str], None]] = None
+
+        self._docs: Dict[str, Dict] = {}  # tasks owned by this process
+        self._dirty = set()
+        self._lock = threading.RLock()  # guards _docs and _dirty; never held across a SQLite write
+        self._flush_lock = threading.Lock()  # one flush at a time, so rows are written in order
+        self._flusher_pid = None
+        self._last_eviction = 0.0
+        super().__init__(path)
+
+    def _ensure_flusher(self):
+        if self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid != os.getpid():
+                self._flusher_pid = os.getpid()
+                threading.Thread(target=self._flush_loop, daemon=True, name='task-store-flusher').start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+                self._check_cancel_requests()
+                if time.time() - self._last_eviction > 60:
+                    self.evict_expired()
+            except Exception as e:
+                print(f"❌ Task store flush failed: {e}")
+
+    def _write(self, rows):
+        now = time.time()
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(
+                '''INSERT INTO domain_tasks (task_id, status, document, finished, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(task_id) DO UPDATE SET
+                       status = excluded.status,
+                       document = excluded.document,
+                       finished = excluded.finished,
+                       updated_at = excluded.updated_at''',
+                [(task_id, doc.get('status', ''), document, int(doc.get('status') in FINISHED_STATUSES), now, now)
+                 for task_id, doc, document in rows]
+            )
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+    def create(self, task_id: str, doc: Dict):
+        """Register a new task owned by this process and persist it immediately"""
+        self._ensure_flusher()
+        with self._lock:
+            self._docs[task_id] = doc
+            self._dirty.add(task_id)
+        self.flush()
+
+    def update(self, task_id: str, mutate: Callable[[Dict], None], flush: bool = False):
+        """Apply `mutate` to the in-memory document; written by the next batch flush"""
+        with self._lock:
+            doc = self._docs.get(task_id)
+            if doc is None:
+                return
+            mutate(doc)
+            self._dirty.add(task_id)
+        if flush or doc.get('status') in FINISHED_STATUSES:
+            self.flush()
+
+    def replace(self, task_id: str, doc: Dict):
+        """Swap in a whole document (e.g. the final setup result) and persist it"""
+        with self._lock:
+            self._docs[task_id] = doc
+            self._dirty.add(task_id)
+        self.flush()
+
+    def flush(self):
+        """
+        Write all dirty documents in one transaction. They are serialized under
+        the lock, which is released for the write itself (a BEGIN IMMEDIATE may
+        wait on other workers), so update() and get() never queue behind SQLite.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                rows = []
+                for task_id in self._dirty:
+                    doc = self._docs[task_id]
+                    rows.append((task_id, doc, json.dumps(doc, default=str)))
+                self._dirty.clear()
+
+            try:
+                self._write(rows)
+            except Exception:
+                with self._lock:
+                    self._dirty.update(task_id for task_id, _, _ in rows)
+                raise
+
+            with self._lock:
+                # Finished tasks are served from SQLite from now on (unless changed again since)
+                for task_id, doc, _ in rows:
+                    if (doc.get('status') in FINISHED_STATUSES and task_id not in self._dirty
+                            and self._docs.get(task_id) is doc):
+                        del self._docs[task_id]
+
+    def get(self, task_id: str) -> Optional[Dict]:
+        with self._lock:
+            doc = self._docs.get(task_id)
+            if doc is not None:
+                return copy.deepcopy(doc)
+
+        row = self._connection().execute(
+            'SELECT document FROM domain_tasks WHERE task_id = ?', (task_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def is_local(self, task_id: str) -> bool:
+        with self._lock:
+            return task_id in self._docs
+
+    def request_cancel(self, task_id: str) -> bool:
+        """Flag a task owned by another process; its flusher picks the flag up"""
+        cursor = self._connection().execute(
+            'UPDATE domain_tasks SET cancel_requested = 1 WHERE task_id = ? AND finished = 0', (task_id,)
+        )
+        return cursor.rowcount > 0
+
+    def _check_cancel_requests(self):
+        with self._lock:
+            local_ids = list(self._docs)
+        if not local_ids or self.on_cancel_requested is None:
+            return
+        placeholders = ','.join('?' * len(local_ids))
+        rows = self._connection().execute(
+            f'SELECT task_id FROM domain_tasks WHERE cancel_requested = 1 AND task_id IN ({placeholders})',
+            local_ids
+        ).fetchall()
+        for (task_id,) in rows:
+            self._connection().execute('UPDATE domain_tasks SET cancel_requested = 0 WHERE task_id = ?', (task_id,))
+            self.on_cancel_requested(task_id)
+
+    def evict_expired(self) -> int:
+        """Delete finished tasks older than the TTL"""
+        self._last_eviction = time.time()
+        cursor = self._connection().execute(
+            'DELETE FROM domain_tasks WHERE finished = 1 AND updated_at < ?', (time.time() - self.ttl,)
+        )
+        if cursor.rowcount:
+            print(f"🧹 Evicted {cursor.rowcount} finished task(s) from the task store")
+        return cursor.rowcount
+
+
+class DomainCheckpointStore(SQLiteStore):
+    """Outputs of completed setup_domain steps per (account, domain, step), for resumable setups"""
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS domain_checkpoints (
+            account_key TEXT NOT NULL,
+            domain TEXT NOT NULL,
+            step TEXT NOT NULL,
+            outputs TEXT NOT NULL,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (account_key, domain, step)
+        );
+    '''
+
+    def save(self, account_key: str, domain: str, step: str, outputs: Dict):
+        self._connection().execute(
+            '''INSERT INTO domain_checkpoints (account_key, domain, step, outputs, updated_at)
+               VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT(account_key, domain, step) DO UPDATE SET
+                   outputs = excluded.outputs,
+                   updated_at = excluded.updated_at''',
+            (account_key, domain, step, json.dumps(outputs, default=str), time.time())
+        )
+
+    def load(self, account_key: str, domain: str) -> Dict[str, Dict]:
+        rows = self._connection().execute(
+            'SELECT step, outputs FROM domain_checkpoints WHERE account_key = ? AND domain = ?',
+            (account_key, domain)
+        ).fetchall()
+        return {step: json.loads(outputs) for step, outputs in rows}
+
+    def clear(self, account_key: str, domain: str):
+        self._connection().execute(
+            'DELETE FROM domain_checkpoints WHERE account_key = ? AND domain = ?', (account_key, domain)
+        )
@@ -0,0 +1,139 @@
+import abc
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional
+
+from config import Config
+
+try:
+    import dns.resolver
+except ImportError:  # dnspython is optional; without it the DNS pre-check is skipped
+    dns = None
+
+
+class WaiterTimeout(TimeoutError):
+    """Raised when a waiter's deadline passes before its condition is met"""
+
+
+class AdaptiveWaiter:
+    """
+    Poll a condition with exponential backoff, jitter and an overall deadline.
+
+    The first check happens immediately; after that the delay grows from
+    `initial_delay` by `multiplier` up to `max_delay`, each delay randomised by
+    +/- `jitter` (a fraction) so concurrent waiters do not poll in lockstep. The
+    last sleep is clipped so the final check lands on the deadline.
+    """
+
+    def __init__(self, initial_delay: float = 1.0, max_delay: float = 30.0, multiplier: float = 2.0,
+                 jitter: float = 0.2, timeout: float = 600, sleep: Callable[[float], None] = None):
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.timeout = timeout
+        self.sleep = sleep or time.sleep
+
+    def delays(self) -> Iterator[float]:
+        delay = self.initial_delay
+        while True:
+            yield max(0.0, delay * (1 + random.uniform(-self.jitter, self.jitter)))
+            delay = min(delay * self.multiplier, self.max_delay)
+
+    def wait(self, condition: Callable[[], object], description: str = 'condition',
+             on_attempt: Callable[[int, float], None] = None):
+        """
+        Call `condition()` until it returns a truthy value and return that value.
+
+        `condition` may raise to abort the wait. `on_attempt(attempt, elapsed)`
+        is called after every unsuccessful check.
+        """
+        start = time.monotonic()
+        deadline = start + self.timeout
+        delays = self.delays()
+        attempt = 0
+
+        while True:
+            attempt += 1
+            value = condition()
+            if value:
+                return value
+
+            now = time.monotonic()
+            if on_attempt:
+                on_attempt(attempt, now - start)
+            remaining = deadline - now
+            if remaining <= 0:
+                raise WaiterTimeout(f"Timed out after {self.timeout} seconds waiting for {description}")
+            self.sleep(min(next(delays), remaining))
+
+    async def wait_async(self, condition: Callable[[], Awaitable[object]], description: str = 'condition',
+                         on_attempt: Callable[[int, float], None] = None):
+        """
+        Like wait(), for a coroutine function `condition`. Sleeps with
+        asyncio.sleep, so a waiting task holds no thread.
+        """
+        start = time.monotonic()
+        deadline = start + self.timeout
+        delays = self.delays()
+        attempt = 0
+
+        while True:
+            attempt += 1
+            value = await condition()
+            if value:
+                return value
+
+            now = time.monotonic()
+            if on_attempt:
+                on_attempt(attempt, now - start)
+            remaining = deadline - now
+            if remaining <= 0:
+                raise WaiterTimeout(f"Timed out after {self.timeout} seconds waiting for {description}")
+            await asyncio.sleep(min(next(delays), remaining))
+
+
+class DNSResolver(abc.ABC):
+    """Pluggable DNS lookup used to see validation records before asking ACM"""
+
+    @abc.abstractmethod
+    def cname_targets(self, name: str) -> List[str]:
+        """Targets `name` currently resolves to as a CNAME ([] if none)"""
+
+
+class DnsPythonResolver(DNSResolver):
+    """Queries public resolvers directly so local negative caching does not hide new records"""
+
+    def __init__(self, nameservers: List[str] = None, lifetime: float = 3.0):
+        self.resolver = dns.resolver.Resolver(configure=not nameservers)
+        if nameservers:
+            self.resolver.nameservers = nameservers
+        self.resolver.lifetime = lifetime
+
+    def cname_targets(self, name: str) -> List[str]:
+        try:
+            answer = self.resolver.resolve(name, 'CNAME')
+        except Exception:
+            return []
+        return [record.target.to_text() for record in answer]
+
+
+def default_dns_resolver() -> Optional[DNSResolver]:
+    if dns is None:
+        return None
+    nameservers = [ns.strip() for ns in Config.DNS_RESOLVER_NAMESERVERS.split(',') if ns.strip()]
+    return DnsPythonResolver(nameservers or None)
+
+
+def _normalize(name: str) -> str:
+    return name.rstrip('.').lower()
+
+
+def cname_records_visible(resolver: DNSResolver, records: List[Dict]) -> bool:
+    """True once every {'name', 'value'} CNAME record resolves to its expected target"""
+    for record in records:
+        targets = {_normalize(target) for target in resolver.cname_targets(record['name'])}
+        if _normalize(record['value']) not in targets:
+            return False
+    return True